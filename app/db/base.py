@@ -0,0 +1,196 @@
+"""
+Storage backend interface shared by all database engines
+"""
+
+import re
+import json
+import zlib
+from abc import ABC, abstractmethod
+from typing import List, Dict, Optional, Tuple
+
+UPDATE_CLAUSE = re.compile(r"\b(set|add)\s+", re.IGNORECASE)
+
+
+def parse_update_expression(
+    update_expression: str,
+    expression_attribute_values: Dict
+) -> Tuple[Dict, Dict]:
+    """
+    The function `parse_update_expression` splits a DynamoDB update expression into the
+    attributes to set and the attributes to increment, so engines other than DynamoDB can apply
+    the same updates.
+
+    Params
+        - update_expression str: An expression such as `Set email = :email ADD visits :one`.
+            Only `SET` and `ADD` clauses of placeholders are supported
+        - expression_attribute_values Dict: The values of the placeholders used in the expression
+
+    Returns
+        - A tuple with a dictionary of the attributes to set and their new values, and a
+            dictionary of the attributes to increment and the amount to add.
+    """
+    parts = UPDATE_CLAUSE.split(update_expression)
+    if parts[0].strip() or len(parts) < 3:
+        raise ValueError(f"Unsupported update expression: {update_expression}")
+
+    updates, increments = {}, {}
+    for clause, assignments in zip(parts[1::2], parts[2::2]):
+        separator = "=" if clause.lower() == "set" else None
+        for assignment in assignments.split(","):
+            if separator:
+                attribute, _, placeholder = assignment.partition(separator)
+            else:
+                attribute, _, placeholder = assignment.strip().partition(" ")
+            attribute, placeholder = attribute.strip(), placeholder.strip()
+            if not attribute or placeholder not in expression_attribute_values:
+                raise ValueError(f"Unsupported update expression: {update_expression}")
+            target = updates if separator else increments
+            target[attribute] = expression_attribute_values[placeholder]
+
+    return updates, increments
+
+
+CONDITION = re.compile(r"^\s*(attribute_exists|attribute_not_exists)\(\s*(\w+)\s*\)\s*$")
+
+
+class ConditionFailedError(Exception):
+    """
+    Raised when the condition of a write is not met, so none of the writes of the transaction
+    are applied.
+    """
+
+
+def check_condition(condition_expression: Optional[str], item: Optional[Dict]) -> bool:
+    """
+    The function `check_condition` evaluates a DynamoDB condition expression against the stored
+    version of an item, for the engines other than DynamoDB.
+
+    Params
+        - condition_expression str: An expression such as `attribute_not_exists(item_id)`. Only
+            `attribute_exists` and `attribute_not_exists` are supported
+        - item Dict: The stored item, or `None` if it does not exist
+
+    Returns
+        - True if the condition is met or there is no condition, False otherwise.
+    """
+    if not condition_expression:
+        return True
+    match = CONDITION.match(condition_expression)
+    if not match:
+        raise ValueError(f"Unsupported condition expression: {condition_expression}")
+    exists = item is not None and match.group(2) in item
+    return exists if match.group(1) == "attribute_exists" else not exists
+
+
+def key_segment(primary_key: List, total_segments: int) -> int:
+    """
+    The function `key_segment` assigns a primary key to one of `total_segments` segments, for
+    the engines that split their parallel scans by hashing the keys.
+
+    Params
+        - primary_key List: The values of the primary key of an item
+        - total_segments int: The number of segments of the scan
+
+    Returns
+        - The segment of the key, between 0 and `total_segments - 1`.
+    """
+    return zlib.crc32(json.dumps(primary_key).encode()) % total_segments
+
+
+class StorageBackend(ABC):
+    """
+    This class defines the operations every storage engine must implement. The semantics follow
+    the `DynamoDB` class, so the services can run against any engine.
+
+    The `table` attribute is the table the engine is currently working with.
+    """
+    table = None
+
+    @abstractmethod
+    async def check_if_table_exists(self, table_name: str) -> bool:
+        """
+        Checks if a table exists and selects it as the current table when it does.
+        """
+
+    @abstractmethod
+    async def create_item(self, item):
+        """
+        Creates (or replaces) an item in the current table.
+        """
+
+    @abstractmethod
+    async def get_item_info(
+        self,
+        keys: List[str],
+        item_keys: List[str],
+        data_to_get: List[str] = None
+    ) -> Optional[Dict]:
+        """
+        Retrieves an item by its primary key, optionally projecting only `data_to_get`. Returns
+        `None` if the item does not exist.
+        """
+
+    @abstractmethod
+    async def scan_item(self, key: str, item: str) -> List[Dict]:
+        """
+        Returns all the items whose attribute `key` is equal to `item`.
+        """
+
+    @abstractmethod
+    async def query_items(self, key: str, item: str, index_name: str = None) -> List[Dict]:
+        """
+        Returns the items whose partition key `key` is equal to `item`, using the secondary
+        index `index_name` when it is provided.
+        """
+
+    @abstractmethod
+    async def scan_segment(self, segment: int, total_segments: int) -> List[Dict]:
+        """
+        Returns all the items of one segment of the current table, so several segments can be
+        scanned in parallel.
+        """
+
+    @abstractmethod
+    async def update_item(
+        self,
+        item_id: Dict,
+        update_expression: str,
+        expression_attribute_values: Dict
+    ) -> Dict:
+        """
+        Updates an item, creating it if it does not exist, and returns the updated attributes.
+        """
+
+    @abstractmethod
+    async def delete_item(self, item_key: Dict) -> Dict:
+        """
+        Deletes an item and returns its old attributes. Like DynamoDB, which returns no
+        `Attributes` for a missing item, raises `KeyError("Attributes")` if it does not exist.
+        """
+
+    @abstractmethod
+    async def transact_write_items(self, operations: List[Dict]) -> None:
+        """
+        Applies several writes to the current table atomically: either all of them are applied
+        or none is. Every operation is a dictionary shaped like the DynamoDB `TransactItems`,
+        with one of the keys:
+
+        - `Put`: `Item` and an optional `ConditionExpression`
+        - `Delete`: `Key` and an optional `ConditionExpression`
+        - `Update`: `Key`, `UpdateExpression`, `ExpressionAttributeValues` and an optional
+            `ConditionExpression`
+
+        Raises `ConditionFailedError` when a condition is not met.
+        """
+
+    @abstractmethod
+    async def batch_create_items(self, items: List) -> None:
+        """
+        Creates (or replaces) several items in the current table.
+        """
+
+    @abstractmethod
+    async def batch_get_items(self, item_keys: List[Dict]) -> List[Dict]:
+        """
+        Retrieves several items by their primary keys, skipping the ones that do not exist.
+        """
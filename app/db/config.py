@@ -0,0 +1,26 @@
+"""
+Database configuration
+"""
+
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class Config:
+    """
+    This class is used to configure the database connection.
+
+    `DB_ENGINE` selects the storage backend: `dynamodb` (default), `memory` or `sqlite`.
+    """
+    DB_ENGINE = os.getenv('DB_ENGINE', 'dynamodb')
+    DB_REGION_NAME = os.getenv('DB_REGION_NAME')
+    DB_ACCESS_KEY_ID = os.getenv('DB_ACCESS_KEY_ID')
+    DB_SECRET_ACCESS_KEY = os.getenv('DB_SECRET_ACCESS_KEY')
+    DB_CALL_TIMEOUT = float(os.getenv('DB_CALL_TIMEOUT', '10'))
+    DB_SQLITE_PATH = os.getenv('DB_SQLITE_PATH', 'nameless.db')
+    DB_KEY_SCHEMA = os.getenv('DB_KEY_SCHEMA', 'username').split(',')
+    DB_INDEXES = [
+        index for index in os.getenv('DB_INDEXES', 'email').split(',') if index
+    ]
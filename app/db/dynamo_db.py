@@ -2,49 +2,118 @@
 Connection to DynamoDB
 """
 
-import os
+import threading
 from typing import List, Dict
-from dotenv import load_dotenv
 
 import boto3
+from botocore.config import Config as BotoConfig
 from botocore.exceptions import ClientError
 from boto3.resources.base import ServiceResource
 from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.types import TypeSerializer
 from fastapi.encoders import jsonable_encoder
 
+from ..utils.deadlines import remaining_time
 from ..utils.logs import LOGGER
+from ..utils.profiling import traced
+from .base import ConditionFailedError, StorageBackend
+from .config import Config
+from .throttling import AdaptiveThrottler, Priority
 
-load_dotenv()
+BATCH_GET_LIMIT = 100
+BATCH_WRITE_LIMIT = 25
 
 
-class Config:
+CALL_TIMEOUTS = sorted(
+    {timeout for timeout in (1.0, 2.0, 5.0) if timeout < Config.DB_CALL_TIMEOUT}
+    | {Config.DB_CALL_TIMEOUT}
+)
+
+
+def call_timeout() -> float:
     """
-    This class is used to configure the DynamoDB connection.
+    The function `call_timeout` picks the time budget of a DynamoDB call from the time left in
+    the current request. The time left is rounded up to one of `CALL_TIMEOUTS`, which are never
+    above `DB_CALL_TIMEOUT`, so every thread only needs a few clients.
+
+    Returns
+        - The timeout of the call in seconds, `DB_CALL_TIMEOUT` when there is no deadline.
     """
-    DB_REGION_NAME = os.getenv('DB_REGION_NAME')
-    DB_ACCESS_KEY_ID = os.getenv('DB_ACCESS_KEY_ID')
-    DB_SECRET_ACCESS_KEY = os.getenv('DB_SECRET_ACCESS_KEY')
+    remaining = remaining_time()
+    if remaining is None:
+        return Config.DB_CALL_TIMEOUT
+    return next(
+        (timeout for timeout in CALL_TIMEOUTS if timeout >= remaining),
+        Config.DB_CALL_TIMEOUT
+    )
 
 
-class DynamoDB():
+class DynamoDB(StorageBackend):
     """
     This class is used to connect to DynamoDB.
 
-    The `table` attribute is a DynamoDB table object.
-    The `dynamo_resource` attribute is a DynamoDB resource object.
+    The `table` attribute is the name of the DynamoDB table.
+    The `throttler` attribute limits the calls sent to every table and index. The SDK retries
+    are disabled, the throttler retries throttled, server and connection errors itself.
+
+    The calls run in worker threads. boto3 resources are not thread safe, so every thread
+    builds its own resources, one for each call timeout in `CALL_TIMEOUTS`. The connect and the
+    read timeouts get half of the call timeout each, so a call never waits longer than it.
     """
-    dynamo_resource = None
     table = None
+    throttler = AdaptiveThrottler()
+    _local = threading.local()
 
-    table = None
-    dynamo_resource: ServiceResource = boto3.resource(
-        'dynamodb',
-        region_name=Config.DB_REGION_NAME,
-        aws_access_key_id=Config.DB_ACCESS_KEY_ID,
-        aws_secret_access_key=Config.DB_SECRET_ACCESS_KEY
-    )
+    @classmethod
+    def _thread_resource(cls) -> ServiceResource:
+        timeout = call_timeout()
+        if not hasattr(cls._local, 'resources'):
+            cls._local.resources = {}
+        resources = cls._local.resources
+        if timeout not in resources:
+            resources[timeout] = boto3.session.Session().resource(
+                'dynamodb',
+                region_name=Config.DB_REGION_NAME,
+                aws_access_key_id=Config.DB_ACCESS_KEY_ID,
+                aws_secret_access_key=Config.DB_SECRET_ACCESS_KEY,
+                config=BotoConfig(
+                    retries={'total_max_attempts': 1},
+                    connect_timeout=timeout / 2,
+                    read_timeout=timeout / 2
+                )
+            )
+        return resources[timeout]
+
+    def _table_operation(self, operation: str, table_name: str = None):
+        table_name = table_name or self.table
 
-    def check_if_table_exists(self, table_name):
+        def run(**kwargs):
+            return getattr(self._thread_resource().Table(table_name), operation)(**kwargs)
+        return run
+
+    def _resource_operation(self, operation: str):
+        def run(**kwargs):
+            return getattr(self._thread_resource(), operation)(**kwargs)
+        return run
+
+    def _client_operation(self, operation: str):
+        def run(**kwargs):
+            return getattr(self._thread_resource().meta.client, operation)(**kwargs)
+        return run
+
+    async def _call(self, operation: str, index_name: str = None, call_priority: Priority = None,
+                    **kwargs):
+        return await self.throttler.call(
+            self._table_operation(operation),
+            self.table,
+            index_name,
+            call_priority,
+            ReturnConsumedCapacity='TOTAL',
+            **kwargs
+        )
+
+    @traced("DynamoDB.check_if_table_exists")
+    async def check_if_table_exists(self, table_name):
         """
         The function checks if a table exists in DynamoDB and returns a boolean value indicating its
         existence.
@@ -58,8 +127,11 @@ class DynamoDB():
                 returns True. If the table does not exist, it returns False.
         """
         try:
-            table = self.dynamo_resource.Table(table_name)
-            table.load()
+            await self.throttler.call(
+                self._table_operation('load', table_name),
+                table_name,
+                limited=False
+            )
             exist = True
         except ClientError as err:
             if err.response['Error']['Code'] == 'ResourceNotFoundException':
@@ -68,9 +140,10 @@ class DynamoDB():
                 print(f"Error: {err.response['Error']['Message']}")
                 raise
         else:
-            self.table = table
+            self.table = table_name
         return exist
 
+    @traced("DynamoDB.create_item")
     async def create_item(self, item):
         """
         The `create_item`method creates an item in a table, and logs an error message if the item 
@@ -81,12 +154,13 @@ class DynamoDB():
             in a database table. It is passed to the "create_item" method as an argument
         """
         try:
-            self.table.put_item(Item=jsonable_encoder(item))
+            await self._call('put_item', Item=jsonable_encoder(item))
         except ClientError as err:
             LOGGER.error("Item ca not be created: %s",
                          err.response['Error']['Message'])
             raise
 
+    @traced("DynamoDB.get_item_info")
     async def get_item_info(
         self,
         keys: List[str],
@@ -114,12 +188,14 @@ class DynamoDB():
         item_to_get = dict(zip(keys, item_keys))
         try:
             if data_to_get:
-                response = self.table.get_item(
+                response = await self._call(
+                    'get_item',
                     Key=item_to_get,
                     AttributesToGet=data_to_get
                 )
             else:
-                response = self.table.get_item(
+                response = await self._call(
+                    'get_item',
                     Key=item_to_get
                 )
         except ClientError as err:
@@ -133,6 +209,7 @@ class DynamoDB():
         except KeyError:
             return None
 
+    @traced("DynamoDB.scan_item")
     async def scan_item(self, key: str, item: str):
         """
         The `scan_item` method scans a table for items that match a given key and returns a list of
@@ -151,7 +228,7 @@ class DynamoDB():
         """
         items = []
         try:
-            response = self.table.scan(**{
+            response = await self._call('scan', **{
                 'FilterExpression': Key(key).eq(item),
             })
 
@@ -163,6 +240,64 @@ class DynamoDB():
 
         return items
 
+    @traced("DynamoDB.query_items")
+    async def query_items(self, key: str, item: str, index_name: str = None):
+        """
+        The `query_items` method queries a table, or one of its secondary indexes, for the items
+        whose partition key matches the given value.
+
+        Params
+            - key [str]: The partition key attribute of the table or of the index
+            - item [str]: The value of the partition key to look for
+            - index_name [str]: The name of the secondary index to query. If it is not provided
+                the table itself is queried
+
+        Returns
+            - A list of items that match the given key and item.
+        """
+        query = {'KeyConditionExpression': Key(key).eq(item)}
+        if index_name:
+            query['IndexName'] = index_name
+
+        try:
+            response = await self._call('query', index_name, **query)
+        except ClientError as err:
+            LOGGER.error("Could not query items: %s",
+                         err.response['Error']['Message'])
+            raise
+
+        return response.get('Items', [])
+
+    @traced("DynamoDB.scan_segment")
+    async def scan_segment(self, segment: int, total_segments: int):
+        """
+        The `scan_segment` method reads one segment of a parallel scan of the table, following
+        the pagination until the whole segment is read.
+
+        Params
+            - segment [int]: The segment to read, between 0 and `total_segments - 1`
+            - total_segments [int]: The number of segments the scan is split into
+
+        Returns
+            - A list with all the items of the segment.
+        """
+        items = []
+        scan = {'Segment': segment, 'TotalSegments': total_segments}
+        try:
+            while True:
+                response = await self._call('scan', **scan)
+                items.extend(response.get('Items', []))
+                if 'LastEvaluatedKey' not in response:
+                    break
+                scan['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        except ClientError as err:
+            LOGGER.error("Could not scan segment: %s",
+                         err.response['Error']['Message'])
+            raise
+
+        return items
+
+    @traced("DynamoDB.update_item")
     async def update_item(
         self,
         item_id: Dict,
@@ -190,7 +325,8 @@ class DynamoDB():
             - The updated attributes of the item that was updated.
         """
         try:
-            response = self.table.update_item(
+            response = await self._call(
+                'update_item',
                 Key=item_id,
                 UpdateExpression=update_expression,
                 ExpressionAttributeValues=expression_attribute_values,
@@ -203,6 +339,7 @@ class DynamoDB():
 
         return response['Attributes']
 
+    @traced("DynamoDB.delete_item")
     async def delete_item(self, item_key: Dict):
         """
         The above function deletes an item from a table using the provided item key.
@@ -214,7 +351,8 @@ class DynamoDB():
         as keys and their corresponding values as values.
         """
         try:
-            deleted_item = self.table.delete_item(
+            deleted_item = await self._call(
+                'delete_item',
                 Key=item_key,
                 ReturnValues="ALL_OLD"
             )
@@ -223,3 +361,103 @@ class DynamoDB():
             LOGGER.error("Could not update user: %s",
                          err.response['Error']['Message'])
             raise
+
+    @traced("DynamoDB.transact_write_items")
+    async def transact_write_items(self, operations: List[Dict]):
+        """
+        The `transact_write_items` method applies several writes to the table in one
+        TransactWriteItems call, so either all of them are applied or none is.
+
+        Params
+            - operations [List[Dict]]: The writes, shaped like the `TransactItems` of DynamoDB
+                but with plain values. The table name is added to every write
+
+        Raises
+            - ConditionFailedError if the condition of a write is not met.
+        """
+        serializer = TypeSerializer()
+        transact_items = []
+        for operation in operations:
+            (kind, request), = operation.items()
+            request = dict(request, TableName=self.table)
+            for field in ('Item', 'Key', 'ExpressionAttributeValues'):
+                if field in request:
+                    request[field] = {
+                        name: serializer.serialize(value)
+                        for name, value in jsonable_encoder(request[field]).items()
+                    }
+            if 'ConditionExpression' in request:
+                request['ReturnValuesOnConditionCheckFailure'] = 'ALL_OLD'
+            transact_items.append({kind: request})
+
+        try:
+            await self.throttler.call(
+                self._client_operation('transact_write_items'),
+                self.table,
+                TransactItems=transact_items,
+                ReturnConsumedCapacity='TOTAL'
+            )
+        except ClientError as err:
+            reasons = err.response.get('CancellationReasons', [])
+            if any(reason.get('Code') == 'ConditionalCheckFailed' for reason in reasons):
+                raise ConditionFailedError(
+                    f"Transaction condition failed on {self.table}"
+                ) from err
+            LOGGER.error("Could not write the transaction: %s",
+                         err.response['Error']['Message'])
+            raise
+
+    @traced("DynamoDB.batch_create_items")
+    async def batch_create_items(self, items: List):
+        """
+        The `batch_create_items` method creates several items in a table, in batches of 25 puts
+        sent through the throttler. The unprocessed items of every batch are sent again once
+        the throttler has slowed down, up to the retries of the call priority.
+
+        Params
+            - items [List]: The items to create in the table
+        """
+        puts = [{'PutRequest': {'Item': jsonable_encoder(item)}} for item in items]
+        try:
+            for start in range(0, len(puts), BATCH_WRITE_LIMIT):
+                await self.throttler.call_batch(
+                    self._resource_operation('batch_write_item'),
+                    self.table,
+                    {self.table: puts[start:start + BATCH_WRITE_LIMIT]},
+                    'UnprocessedItems',
+                    ReturnConsumedCapacity='TOTAL'
+                )
+        except ClientError as err:
+            LOGGER.error("Items can not be created: %s",
+                         err.response['Error']['Message'])
+            raise
+
+    @traced("DynamoDB.batch_get_items")
+    async def batch_get_items(self, item_keys: List[Dict]):
+        """
+        The `batch_get_items` method retrieves several items from a table by their primary keys.
+
+        Params
+            - item_keys [List[Dict]]: The primary keys of the items to retrieve
+
+        Returns
+            - A list with the items found. Keys that do not exist are skipped.
+        """
+        items = []
+        try:
+            for start in range(0, len(item_keys), BATCH_GET_LIMIT):
+                responses = await self.throttler.call_batch(
+                    self._resource_operation('batch_get_item'),
+                    self.table,
+                    {self.table: {'Keys': item_keys[start:start + BATCH_GET_LIMIT]}},
+                    'UnprocessedKeys',
+                    ReturnConsumedCapacity='TOTAL'
+                )
+                for response in responses:
+                    items.extend(response['Responses'].get(self.table, []))
+        except ClientError as err:
+            LOGGER.error("Could not get items: %s",
+                         err.response['Error']['Message'])
+            raise
+
+        return items
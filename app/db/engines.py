@@ -0,0 +1,42 @@
+"""
+Selection of the storage engine
+"""
+
+from typing import List
+
+from .base import StorageBackend
+from .config import Config
+
+
+def get_database(
+    engine: str = None,
+    key_schema: List[str] = None,
+    indexes: List[str] = None
+) -> StorageBackend:
+    """
+    The function `get_database` builds the storage engine selected by the `DB_ENGINE` setting.
+
+    Params
+        - engine str: The name of the engine to use (`dynamodb`, `memory` or `sqlite`). If it is
+            not provided the `DB_ENGINE` setting is used
+        - key_schema List[str]: The primary key attributes of the table. DynamoDB reads them from
+            the table, the other engines use `DB_KEY_SCHEMA` if they are not provided
+        - indexes List[str]: The attributes with a secondary index in the engines that need them
+            declared. If they are not provided `DB_INDEXES` is used
+
+    Returns
+        - An instance of the selected storage engine.
+    """
+    engine = (engine or Config.DB_ENGINE).lower()
+
+    if engine == "dynamodb":
+        from .dynamo_db import DynamoDB  # pylint: disable=import-outside-toplevel
+        return DynamoDB()
+    if engine == "memory":
+        from .memory_db import MemoryDB  # pylint: disable=import-outside-toplevel
+        return MemoryDB(key_schema, indexes)
+    if engine == "sqlite":
+        from .sqlite_db import SQLiteDB  # pylint: disable=import-outside-toplevel
+        return SQLiteDB(key_schema=key_schema, indexes=indexes)
+
+    raise ValueError(f"Unknown database engine: {engine}")
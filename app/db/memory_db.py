@@ -0,0 +1,205 @@
+"""
+In-memory storage engine
+"""
+
+from collections import defaultdict
+from typing import List, Dict
+
+from fastapi.encoders import jsonable_encoder
+
+from .base import (
+    ConditionFailedError,
+    StorageBackend,
+    check_condition,
+    key_segment,
+    parse_update_expression,
+)
+from .config import Config
+
+
+class MemoryDB(StorageBackend):
+    """
+    This class keeps the tables in memory, following the same semantics as `DynamoDB`. It is
+    meant for tests, benchmarks and local runs.
+
+    The `tables` attribute maps every table name to its items, indexed by primary key.
+    The `indexes` attribute maps every table name to its secondary indexes, which map an
+    attribute value to the primary keys of the items that have it.
+    """
+
+    def __init__(self, key_schema: List[str] = None, indexes: List[str] = None):
+        self.key_schema = key_schema or Config.DB_KEY_SCHEMA
+        self.indexed_attributes = Config.DB_INDEXES if indexes is None else indexes
+        self.tables: Dict[str, Dict[tuple, Dict]] = {}
+        self.indexes: Dict[str, Dict[str, Dict]] = {}
+
+    async def check_if_table_exists(self, table_name):
+        """
+        Selects the table `table_name` as the current table. In-memory tables are created the
+        first time they are used, so this method always returns True.
+        """
+        if table_name not in self.tables:
+            self.tables[table_name] = {}
+            self.indexes[table_name] = {
+                attribute: defaultdict(set) for attribute in self.indexed_attributes
+            }
+        self.table = table_name
+        return True
+
+    def __primary_key(self, item: Dict) -> tuple:
+        return tuple(item[key] for key in self.key_schema)
+
+    def __index(self, primary_key: tuple, item: Dict):
+        for attribute, index in self.indexes[self.table].items():
+            if attribute in item:
+                index[item[attribute]].add(primary_key)
+
+    def __unindex(self, primary_key: tuple, item: Dict):
+        for attribute, index in self.indexes[self.table].items():
+            if attribute in item:
+                index[item[attribute]].discard(primary_key)
+                if not index[item[attribute]]:
+                    del index[item[attribute]]
+
+    def __put(self, item: Dict):
+        items = self.tables[self.table]
+        primary_key = self.__primary_key(item)
+        if primary_key in items:
+            self.__unindex(primary_key, items[primary_key])
+        items[primary_key] = item
+        self.__index(primary_key, item)
+
+    async def create_item(self, item):
+        """
+        Creates (or replaces) an item in the current table.
+        """
+        self.__put(jsonable_encoder(item))
+
+    async def get_item_info(
+        self,
+        keys: List[str],
+        item_keys: List[str],
+        data_to_get: List[str] = None
+    ):
+        """
+        Retrieves an item by its primary key, projecting only `data_to_get` when it is provided.
+        Returns `None` if the item does not exist.
+        """
+        item = self.tables[self.table].get(self.__primary_key(dict(zip(keys, item_keys))))
+        if item is None:
+            return None
+        if data_to_get:
+            return {key: item[key] for key in data_to_get if key in item}
+        return dict(item)
+
+    async def scan_item(self, key: str, item: str):
+        """
+        Returns all the items whose attribute `key` is equal to `item`. Indexed attributes are
+        resolved through their secondary index instead of reading the whole table.
+        """
+        items = self.tables[self.table]
+        index = self.indexes[self.table].get(key)
+        if index is not None:
+            return [dict(items[primary_key]) for primary_key in index.get(item, ())]
+        return [dict(value) for value in items.values() if value.get(key) == item]
+
+    async def query_items(self, key: str, item: str, index_name: str = None):
+        """
+        Returns the items whose partition key `key` is equal to `item`. Secondary indexes are
+        keyed by attribute, so `index_name` is not needed to find them.
+        """
+        if key == self.key_schema[0] and not index_name:
+            if len(self.key_schema) == 1:
+                found = self.tables[self.table].get((item,))
+                return [dict(found)] if found is not None else []
+            return [
+                dict(value) for primary_key, value in self.tables[self.table].items()
+                if primary_key[0] == item
+            ]
+        return await self.scan_item(key, item)
+
+    async def scan_segment(self, segment: int, total_segments: int):
+        """
+        Returns all the items of one segment of the current table.
+        """
+        return [
+            dict(item) for primary_key, item in self.tables[self.table].items()
+            if key_segment(list(primary_key), total_segments) == segment
+        ]
+
+    def __update(self, item_id: Dict, update_expression: str, expression_attribute_values: Dict):
+        updates, increments = jsonable_encoder(
+            parse_update_expression(update_expression, expression_attribute_values)
+        )
+        item = dict(self.tables[self.table].get(self.__primary_key(item_id), item_id))
+        for attribute, amount in increments.items():
+            updates[attribute] = item.get(attribute, 0) + amount
+        item.update(updates)
+        self.__put(item)
+        return updates
+
+    async def update_item(
+        self,
+        item_id: Dict,
+        update_expression: str,
+        expression_attribute_values: Dict
+    ):
+        """
+        Applies a `SET`/`ADD` update expression to an item, creating it if it does not exist,
+        and returns the updated attributes.
+        """
+        return self.__update(item_id, update_expression, expression_attribute_values)
+
+    async def delete_item(self, item_key: Dict):
+        """
+        Deletes an item and returns its old attributes.
+        """
+        primary_key = self.__primary_key(item_key)
+        if primary_key not in self.tables[self.table]:
+            raise KeyError("Attributes")
+        deleted_item = self.tables[self.table].pop(primary_key)
+        self.__unindex(primary_key, deleted_item)
+        return deleted_item
+
+    async def transact_write_items(self, operations: List[Dict]):
+        """
+        Applies several writes atomically. All the conditions are checked before any write is
+        applied, and nothing awaits in between, so no other call sees a partial transaction.
+        """
+        items = self.tables[self.table]
+        for operation in operations:
+            (kind, request), = operation.items()
+            key = request['Item'] if kind == 'Put' else request['Key']
+            stored = items.get(self.__primary_key(jsonable_encoder(key)))
+            if not check_condition(request.get('ConditionExpression'), stored):
+                raise ConditionFailedError(f"{kind} condition failed on {self.table}")
+
+        for operation in operations:
+            (kind, request), = operation.items()
+            if kind == 'Put':
+                self.__put(jsonable_encoder(request['Item']))
+            elif kind == 'Delete':
+                primary_key = self.__primary_key(jsonable_encoder(request['Key']))
+                if primary_key in items:
+                    self.__unindex(primary_key, items.pop(primary_key))
+            else:
+                self.__update(
+                    request['Key'],
+                    request['UpdateExpression'],
+                    request['ExpressionAttributeValues']
+                )
+
+    async def batch_create_items(self, items: List):
+        """
+        Creates (or replaces) several items in the current table.
+        """
+        for item in items:
+            self.__put(jsonable_encoder(item))
+
+    async def batch_get_items(self, item_keys: List[Dict]):
+        """
+        Retrieves several items by their primary keys, skipping the ones that do not exist.
+        """
+        items = self.tables[self.table]
+        found = (items.get(self.__primary_key(item_key)) for item_key in item_keys)
+        return [dict(item) for item in found if item is not None]
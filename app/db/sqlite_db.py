@@ -0,0 +1,281 @@
+"""
+SQLite storage engine
+"""
+
+import re
+import json
+import sqlite3
+from typing import List, Dict
+
+from fastapi.encoders import jsonable_encoder
+
+from ..utils.logs import LOGGER
+from .base import (
+    ConditionFailedError,
+    StorageBackend,
+    check_condition,
+    key_segment,
+    parse_update_expression,
+)
+from .config import Config
+
+IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_.-]*$")
+
+
+def _identifier(name: str) -> str:
+    if not IDENTIFIER.match(name):
+        raise ValueError(f"Invalid identifier: {name}")
+    return name
+
+
+class SQLiteDB(StorageBackend):
+    """
+    This class stores the tables in a SQLite database, following the same semantics as
+    `DynamoDB`. It is meant for single node deployments that do not have access to DynamoDB.
+
+    Every table has a `pk` column with the primary key and a `data` column with the item as
+    JSON. The secondary indexes are expression indexes over the JSON attributes.
+    """
+
+    def __init__(
+        self,
+        path: str = None,
+        key_schema: List[str] = None,
+        indexes: List[str] = None
+    ):
+        self.key_schema = key_schema or Config.DB_KEY_SCHEMA
+        self.indexed_attributes = Config.DB_INDEXES if indexes is None else indexes
+        self.connection = sqlite3.connect(
+            path or Config.DB_SQLITE_PATH,
+            check_same_thread=False
+        )
+        self.connection.create_function(
+            "key_segment",
+            2,
+            lambda primary_key, total_segments: key_segment(
+                json.loads(primary_key), total_segments
+            ),
+            deterministic=True
+        )
+
+    @staticmethod
+    def __attribute(key: str) -> str:
+        return f"json_extract(data, '$.\"{_identifier(key)}\"')"
+
+    def __primary_key(self, item: Dict) -> str:
+        return json.dumps([item[key] for key in self.key_schema])
+
+    def __execute(self, message: str, sql: str, parameters=()) -> List[tuple]:
+        try:
+            with self.connection:
+                return self.connection.execute(sql, parameters).fetchall()
+        except sqlite3.Error as err:
+            LOGGER.error("%s: %s", message, err)
+            raise
+
+    def __put_many(self, message: str, items: List[Dict]):
+        try:
+            with self.connection:
+                self.connection.executemany(
+                    f'INSERT OR REPLACE INTO "{self.table}" (pk, data) VALUES (?, ?)',
+                    [(self.__primary_key(item), json.dumps(item)) for item in items]
+                )
+        except sqlite3.Error as err:
+            LOGGER.error("%s: %s", message, err)
+            raise
+
+    async def check_if_table_exists(self, table_name):
+        """
+        Selects the table `table_name` as the current table, creating it and its secondary
+        indexes if they do not exist yet, so this method always returns True.
+        """
+        table_name = _identifier(table_name)
+        self.__execute(
+            "Could not create table",
+            f'CREATE TABLE IF NOT EXISTS "{table_name}" (pk TEXT PRIMARY KEY, data TEXT NOT NULL)'
+        )
+        for attribute in self.indexed_attributes:
+            self.__execute(
+                "Could not create index",
+                f'CREATE INDEX IF NOT EXISTS "{table_name}_{_identifier(attribute)}" '
+                f'ON "{table_name}" ({self.__attribute(attribute)})'
+            )
+        self.table = table_name
+        return True
+
+    async def create_item(self, item):
+        """
+        Creates (or replaces) an item in the current table.
+        """
+        self.__put_many("Item can not be created", [jsonable_encoder(item)])
+
+    async def get_item_info(
+        self,
+        keys: List[str],
+        item_keys: List[str],
+        data_to_get: List[str] = None
+    ):
+        """
+        Retrieves an item by its primary key, projecting only `data_to_get` when it is provided.
+        Returns `None` if the item does not exist.
+        """
+        rows = self.__execute(
+            "Could not get item",
+            f'SELECT data FROM "{self.table}" WHERE pk = ?',
+            (self.__primary_key(dict(zip(keys, item_keys))),)
+        )
+        if not rows:
+            return None
+        item = json.loads(rows[0][0])
+        if data_to_get:
+            return {key: item[key] for key in data_to_get if key in item}
+        return item
+
+    async def scan_item(self, key: str, item: str):
+        """
+        Returns all the items whose attribute `key` is equal to `item`.
+        """
+        rows = self.__execute(
+            "Could not scan items",
+            f'SELECT data FROM "{self.table}" WHERE {self.__attribute(key)} = ?',
+            (item,)
+        )
+        return [json.loads(row[0]) for row in rows]
+
+    async def query_items(self, key: str, item: str, index_name: str = None):
+        """
+        Returns the items whose partition key `key` is equal to `item`. Secondary indexes are
+        expression indexes, so SQLite picks them without `index_name`.
+        """
+        if key == self.key_schema[0] and len(self.key_schema) == 1 and not index_name:
+            found = await self.get_item_info([key], [item])
+            return [found] if found is not None else []
+        return await self.scan_item(key, item)
+
+    async def scan_segment(self, segment: int, total_segments: int):
+        """
+        Returns all the items of one segment of the current table.
+        """
+        rows = self.__execute(
+            "Could not scan items",
+            f'SELECT data FROM "{self.table}" WHERE key_segment(pk, ?) = ?',
+            (total_segments, segment)
+        )
+        return [json.loads(row[0]) for row in rows]
+
+    def __stored(self, primary_key: str):
+        row = self.connection.execute(
+            f'SELECT data FROM "{self.table}" WHERE pk = ?', (primary_key,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def __apply_update(
+        self,
+        item_id: Dict,
+        update_expression: str,
+        expression_attribute_values: Dict
+    ) -> Dict:
+        updates, increments = jsonable_encoder(
+            parse_update_expression(update_expression, expression_attribute_values)
+        )
+        primary_key = self.__primary_key(item_id)
+        item = self.__stored(primary_key) or dict(item_id)
+        for attribute, amount in increments.items():
+            updates[attribute] = item.get(attribute, 0) + amount
+        item.update(updates)
+        self.connection.execute(
+            f'INSERT OR REPLACE INTO "{self.table}" (pk, data) VALUES (?, ?)',
+            (primary_key, json.dumps(item))
+        )
+        return updates
+
+    async def update_item(
+        self,
+        item_id: Dict,
+        update_expression: str,
+        expression_attribute_values: Dict
+    ):
+        """
+        Applies a `SET`/`ADD` update expression to an item, creating it if it does not exist,
+        and returns the updated attributes. The read and the write run in one transaction, so
+        concurrent increments are not lost.
+        """
+        try:
+            with self.connection:
+                self.connection.execute("BEGIN IMMEDIATE")
+                return self.__apply_update(
+                    item_id, update_expression, expression_attribute_values
+                )
+        except sqlite3.Error as err:
+            LOGGER.error("Could not update item: %s", err)
+            raise
+
+    async def delete_item(self, item_key: Dict):
+        """
+        Deletes an item and returns its old attributes.
+        """
+        rows = self.__execute(
+            "Could not delete item",
+            f'DELETE FROM "{self.table}" WHERE pk = ? RETURNING data',
+            (self.__primary_key(item_key),)
+        )
+        if not rows:
+            raise KeyError("Attributes")
+        return json.loads(rows[0][0])
+
+    async def transact_write_items(self, operations: List[Dict]):
+        """
+        Applies several writes in one SQLite transaction, which is rolled back if a condition
+        is not met.
+        """
+        try:
+            with self.connection:
+                self.connection.execute("BEGIN IMMEDIATE")
+                for operation in operations:
+                    (kind, request), = operation.items()
+                    target = jsonable_encoder(
+                        request['Item'] if kind == 'Put' else request['Key']
+                    )
+                    primary_key = self.__primary_key(target)
+                    condition = request.get('ConditionExpression')
+                    if condition and not check_condition(condition, self.__stored(primary_key)):
+                        raise ConditionFailedError(f"{kind} condition failed on {self.table}")
+
+                    if kind == 'Put':
+                        self.connection.execute(
+                            f'INSERT OR REPLACE INTO "{self.table}" (pk, data) VALUES (?, ?)',
+                            (primary_key, json.dumps(target))
+                        )
+                    elif kind == 'Delete':
+                        self.connection.execute(
+                            f'DELETE FROM "{self.table}" WHERE pk = ?', (primary_key,)
+                        )
+                    else:
+                        self.__apply_update(
+                            target,
+                            request['UpdateExpression'],
+                            request['ExpressionAttributeValues']
+                        )
+        except sqlite3.Error as err:
+            LOGGER.error("Could not write the transaction: %s", err)
+            raise
+
+    async def batch_create_items(self, items: List):
+        """
+        Creates (or replaces) several items in the current table in a single transaction.
+        """
+        self.__put_many("Items can not be created", [jsonable_encoder(item) for item in items])
+
+    async def batch_get_items(self, item_keys: List[Dict]):
+        """
+        Retrieves several items by their primary keys, skipping the ones that do not exist.
+        """
+        if not item_keys:
+            return []
+        primary_keys = [self.__primary_key(item_key) for item_key in item_keys]
+        rows = self.__execute(
+            "Could not get items",
+            f'SELECT data FROM "{self.table}" WHERE pk IN ({", ".join("?" * len(primary_keys))})',
+            primary_keys
+        )
+        return [json.loads(row[0]) for row in rows]
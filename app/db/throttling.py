@@ -0,0 +1,392 @@
+"""
+Client-side adaptive throttling for DynamoDB
+"""
+
+import os
+import time
+import random
+import asyncio
+from enum import Enum
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+from botocore.exceptions import ClientError, HTTPClientError
+from botocore.exceptions import ConnectionError as BotoConnectionError
+
+from ..utils.logs import LOGGER
+from ..utils.deadlines import (
+    DEADLINE_METRICS,
+    DeadlineExceeded,
+    check_deadline,
+    remaining_time,
+    run_with_deadline,
+)
+
+load_dotenv()
+
+THROTTLE_ERROR_CODES = {
+    'ProvisionedThroughputExceededException',
+    'ThrottlingException',
+    'RequestLimitExceeded',
+}
+
+TRANSIENT_ERROR_CODES = {
+    'InternalServerError',
+    'InternalFailure',
+    'ServiceUnavailable',
+    'TransactionConflictException',
+}
+
+CONFLICT_REASON_CODES = {'TransactionConflict', 'None'}
+
+TOKEN_TOLERANCE = 1e-6
+
+
+class ThrottlingConfig:
+    """
+    This class is used to configure the client-side throttling. Rates are in capacity units per
+    second, delays in seconds.
+    """
+    DB_THROTTLE_INITIAL_RATE = float(os.getenv('DB_THROTTLE_INITIAL_RATE', '100'))
+    DB_THROTTLE_MIN_RATE = float(os.getenv('DB_THROTTLE_MIN_RATE', '1'))
+    DB_THROTTLE_MAX_RATE = float(os.getenv('DB_THROTTLE_MAX_RATE', '10000'))
+    DB_THROTTLE_INCREASE = float(os.getenv('DB_THROTTLE_INCREASE', '1'))
+    DB_THROTTLE_DECREASE = float(os.getenv('DB_THROTTLE_DECREASE', '0.5'))
+    DB_THROTTLE_INTERACTIVE_RESERVE = float(os.getenv('DB_THROTTLE_INTERACTIVE_RESERVE', '0.5'))
+    DB_THROTTLE_BASE_DELAY = float(os.getenv('DB_THROTTLE_BASE_DELAY', '0.05'))
+
+
+class Priority(str, Enum):
+    """
+    This class represents the priority class of a database call.
+
+    Interactive calls serve users and retry briefly. Batch calls can only use the capacity that
+    is not reserved for interactive calls, and retry for longer.
+    """
+    INTERACTIVE = "interactive"
+    BATCH = "batch"
+
+
+RETRY_POLICY = {
+    Priority.INTERACTIVE: {"max_retries": 3, "max_delay": 1.0},
+    Priority.BATCH: {"max_retries": 8, "max_delay": 20.0},
+}
+
+_current_priority: ContextVar[Priority] = ContextVar(
+    "current_priority", default=Priority.INTERACTIVE
+)
+
+
+@contextmanager
+def priority(value: Priority):
+    """
+    The function `priority` sets the priority class of the database calls made inside the
+    block, so batch jobs can run with `Priority.BATCH` without changing the call sites.
+
+    Params
+        - value Priority: The priority class of the calls
+    """
+    token = _current_priority.set(value)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority() -> Priority:
+    """
+    The function `current_priority` returns the priority class set with `priority` for the
+    calls made in the current context.
+    """
+    return _current_priority.get()
+
+
+class ThrottledError(Exception):
+    """
+    Raised when a call is still throttled after all its retries.
+    """
+
+    def __init__(self, resource: str, retry_after: float):
+        super().__init__(f"{resource} is throttled")
+        self.resource = resource
+        self.retry_after = retry_after
+
+
+class AdaptiveLimiter:
+    """
+    This class limits the capacity consumed on a table or index with a token bucket whose rate
+    is controlled with AIMD: it grows additively while calls succeed and is cut multiplicatively
+    when DynamoDB throttles.
+
+    The `rate` attribute is the current send rate in capacity units per second.
+    The `consumed` and `throttles` attributes count the capacity consumed and the throttled calls.
+    """
+
+    def __init__(
+        self,
+        rate: float = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable = asyncio.sleep
+    ):
+        self.rate = rate or ThrottlingConfig.DB_THROTTLE_INITIAL_RATE
+        self.tokens = self.rate
+        self.consumed = 0.0
+        self.throttles = 0
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.rate, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, cost: float = 1.0, call_priority: Priority = Priority.INTERACTIVE) -> float:
+        """
+        Takes `cost` tokens if they are available and returns 0, or returns the seconds to wait
+        before trying again. Batch calls leave the interactive reserve untouched.
+        """
+        self._refill()
+        needed = cost
+        if call_priority is Priority.BATCH:
+            needed += self.rate * ThrottlingConfig.DB_THROTTLE_INTERACTIVE_RESERVE
+        needed = min(needed, self.rate)
+
+        if self.tokens >= needed - TOKEN_TOLERANCE:
+            self.tokens -= cost
+            return 0.0
+        return (needed - self.tokens) / self.rate
+
+    async def acquire(self, cost: float = 1.0, call_priority: Priority = Priority.INTERACTIVE):
+        """
+        Waits until `cost` tokens are available for a call of the given priority and takes them,
+        giving up if the current request would run out of time while waiting.
+        """
+        delay = self.wait_time(cost, call_priority)
+        while delay:
+            check_deadline("waiting for capacity", delay)
+            await self._sleep(delay)
+            delay = self.wait_time(cost, call_priority)
+
+    def on_success(self, consumed: float, reserved: float = 1.0):
+        """
+        Charges the capacity actually consumed by a call, beyond the `reserved` tokens taken
+        before it, and increases the rate additively.
+        """
+        self.consumed += consumed
+        self.tokens -= max(consumed - reserved, 0.0)
+        self.rate = min(
+            ThrottlingConfig.DB_THROTTLE_MAX_RATE,
+            self.rate + ThrottlingConfig.DB_THROTTLE_INCREASE * max(consumed, 1.0) / self.rate
+        )
+
+    def on_throttle(self):
+        """
+        Decreases the rate multiplicatively after a throttled call.
+        """
+        self.throttles += 1
+        self.rate = max(
+            ThrottlingConfig.DB_THROTTLE_MIN_RATE,
+            self.rate * ThrottlingConfig.DB_THROTTLE_DECREASE
+        )
+        self.tokens = min(self.tokens, 0.0)
+
+
+def consumed_capacity(response: Dict) -> float:
+    """
+    The function `consumed_capacity` reads the capacity units consumed by a call from a response
+    requested with `ReturnConsumedCapacity='TOTAL'`.
+
+    Params
+        - response Dict: The response of the call
+
+    Returns
+        - The capacity units consumed, or 1 if the response does not report them.
+    """
+    capacity = response.get('ConsumedCapacity')
+    if isinstance(capacity, list):
+        return sum(entry.get('CapacityUnits', 0.0) for entry in capacity) or 1.0
+    if capacity:
+        return capacity.get('CapacityUnits', 1.0)
+    return 1.0
+
+
+def error_kind(err: Exception) -> Optional[str]:
+    """
+    The function `error_kind` tells if a failed call can be retried.
+
+    Params
+        - err Exception: The error raised by the call
+
+    Returns
+        - `"throttled"` if DynamoDB throttled the call, `"transient"` for server and connection
+            errors and for transactions cancelled only by conflicts with other transactions,
+            or `None` if the call must not be retried.
+    """
+    if isinstance(err, ClientError):
+        code = err.response['Error']['Code']
+        if code in THROTTLE_ERROR_CODES:
+            return "throttled"
+        if code == 'TransactionCanceledException':
+            reasons = {reason.get('Code') for reason in err.response.get('CancellationReasons', [])}
+            if 'TransactionConflict' in reasons and reasons <= CONFLICT_REASON_CODES:
+                return "transient"
+            return None
+        status_code = err.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0)
+        if code in TRANSIENT_ERROR_CODES or status_code >= 500:
+            return "transient"
+        return None
+    if isinstance(err, (BotoConnectionError, HTTPClientError)):
+        return "transient"
+    return None
+
+
+class AdaptiveThrottler:
+    """
+    This class runs database calls through one `AdaptiveLimiter` per table and index, retrying
+    throttled calls, and calls that failed with server or connection errors or transaction
+    conflicts, with jittered exponential backoff. Only throttled calls reduce the rate.
+
+    The `limiters` attribute maps every `(table, index)` pair to its limiter.
+    """
+
+    def __init__(
+        self,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable = asyncio.sleep
+    ):
+        self.limiters: Dict[Tuple[str, Optional[str]], AdaptiveLimiter] = {}
+        self._clock = clock
+        self._sleep = sleep
+
+    def limiter(self, table_name: str, index_name: str = None) -> AdaptiveLimiter:
+        """
+        Returns the limiter of a table or index, creating it the first time it is used.
+        """
+        key = (table_name, index_name)
+        if key not in self.limiters:
+            self.limiters[key] = AdaptiveLimiter(clock=self._clock, sleep=self._sleep)
+        return self.limiters[key]
+
+    async def call(
+        self,
+        operation: Callable,
+        table_name: str,
+        index_name: str = None,
+        call_priority: Priority = None,
+        limited: bool = True,
+        **kwargs
+    ):
+        """
+        The method `call` runs a database operation once the limiter of the table or index lets
+        it through, retrying it while DynamoDB throttles it. The operation runs in a worker
+        thread and is abandoned when the current request runs out of time, and retries that
+        could not finish in time are skipped.
+
+        Params
+            - operation Callable: The boto3 operation to call
+            - table_name str: The table the operation runs on
+            - index_name str: The index the operation runs on, if any
+            - call_priority Priority: The priority class of the call. If it is not provided the
+                priority set with `priority` is used
+            - limited bool: Whether the call consumes table capacity. Control plane calls, such
+                as DescribeTable, pass False to be retried without going through the limiter
+            - kwargs: The arguments of the operation
+
+        Returns
+            - The response of the operation.
+        """
+        call_priority = call_priority or current_priority()
+        policy = RETRY_POLICY[call_priority]
+        limiter = self.limiter(table_name, index_name)
+        resource = f"{table_name}/{index_name}" if index_name else table_name
+
+        for attempt in range(policy["max_retries"] + 1):
+            if limited:
+                await limiter.acquire(call_priority=call_priority)
+            try:
+                response = await run_with_deadline(resource, operation, **kwargs)
+            except (ClientError, BotoConnectionError, HTTPClientError) as err:
+                kind = error_kind(err)
+                if kind is None:
+                    raise
+                if kind == "throttled" and limited:
+                    limiter.on_throttle()
+                delay = random.uniform(0, min(
+                    policy["max_delay"],
+                    ThrottlingConfig.DB_THROTTLE_BASE_DELAY * 2 ** attempt
+                ))
+                if attempt == policy["max_retries"]:
+                    LOGGER.error("Call on %s failed (%s), giving up after %d attempts",
+                                 resource, kind, attempt + 1)
+                    if kind == "throttled":
+                        raise ThrottledError(resource, delay) from err
+                    raise
+                remaining = remaining_time()
+                if remaining is not None and delay >= remaining:
+                    DEADLINE_METRICS.record("retries_skipped")
+                    raise DeadlineExceeded(resource) from err
+                LOGGER.warning("Call on %s failed (%s, attempt %d), retrying in %.3fs",
+                               resource, kind, attempt + 1, delay)
+                await self._sleep(delay)
+            else:
+                if limited:
+                    limiter.on_success(consumed_capacity(response))
+                return response
+
+    async def call_batch(
+        self,
+        operation: Callable,
+        table_name: str,
+        request_items: Dict,
+        unprocessed: str,
+        call_priority: Priority = None,
+        **kwargs
+    ) -> List[Dict]:
+        """
+        The method `call_batch` runs a batch operation through `call`, and sends again the part
+        of the batch that DynamoDB left unprocessed, after slowing down the limiter of the
+        table. The resends are bounded by the retry policy of the call priority.
+
+        Params
+            - operation Callable: The boto3 batch operation to call
+            - table_name str: The table the operation runs on
+            - request_items Dict: The `RequestItems` of the first call
+            - unprocessed str: The key of the response holding the unprocessed requests, such
+                as `UnprocessedItems`
+            - call_priority Priority: The priority class of the call. If it is not provided the
+                priority set with `priority` is used
+            - kwargs: The other arguments of the operation
+
+        Returns
+            - The responses of every call.
+
+        Raises
+            - ThrottledError if part of the batch is still unprocessed after all the resends.
+        """
+        call_priority = call_priority or current_priority()
+        policy = RETRY_POLICY[call_priority]
+
+        responses = []
+        for attempt in range(policy["max_retries"] + 1):
+            response = await self.call(
+                operation,
+                table_name,
+                call_priority=call_priority,
+                RequestItems=request_items,
+                **kwargs
+            )
+            responses.append(response)
+            request_items = response.get(unprocessed)
+            if not request_items:
+                return responses
+            self.limiter(table_name).on_throttle()
+            LOGGER.warning("Batch on %s left requests unprocessed (attempt %d)",
+                           table_name, attempt + 1)
+
+        delay = min(policy["max_delay"], ThrottlingConfig.DB_THROTTLE_BASE_DELAY * 2 ** attempt)
+        LOGGER.error("Batch on %s still unprocessed, giving up after %d attempts",
+                     table_name, attempt + 1)
+        raise ThrottledError(table_name, delay)
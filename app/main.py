@@ -2,18 +2,73 @@
 Nameless app
 """
 
-from fastapi import FastAPI
+import math
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi import status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from .routers import users
 from .routers import items
+from .routers import admin
+from .db.throttling import ThrottledError
+from .utils.deadlines import DEADLINE_METRICS, DeadlineExceeded, DeadlineMiddleware, elapsed_time
+from .utils.profiling import ProfilingMiddleware, install_task_tracking
+
 
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    """
+    Links the tasks of profiled requests to their profiles.
+    """
+    install_task_tracking(asyncio.get_running_loop())
+    yield
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware
 )
 
+app.add_middleware(
+    ProfilingMiddleware
+)
+
+app.add_middleware(
+    DeadlineMiddleware
+)
+
+
+@app.exception_handler(ThrottledError)
+async def throttled_error_handler(request: Request, exc: ThrottledError):
+    """
+    Answers with 503 and a `Retry-After` header when the database is still throttling a call
+    after all its retries, so clients back off instead of retrying at once.
+    """
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Service temporarily overloaded"},
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))}
+    )
+
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    """
+    Answers with 504 when the request runs out of time, instead of finishing work the client
+    is no longer waiting for.
+    """
+    DEADLINE_METRICS.record("deadline_exceeded", elapsed_time())
+    return JSONResponse(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        content={"detail": f"Request deadline exceeded before {exc.operation}"}
+    )
+
+
 app.include_router(users.router)
 app.include_router(items.router)
+app.include_router(admin.router)
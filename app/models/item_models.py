@@ -2,6 +2,8 @@
 Here you will find the models for items.
 """
 from enum import Enum
+from typing import Dict
+from uuid import UUID
 
 from pydantic import BaseModel
 
@@ -23,3 +25,18 @@ class Item(BaseModel):
     name: str
     description: str
     type: ItemType
+
+
+class ItemID(Item):
+    """
+    Adds the item ID to the item.
+    """
+    item_id: UUID
+
+
+class ItemStats(BaseModel):
+    """
+    This class represents the number of items, in total and by type.
+    """
+    total: int
+    by_type: Dict[ItemType, int]
@@ -0,0 +1,32 @@
+"""
+Request profile models
+"""
+
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class Span(BaseModel):
+    """
+    This class represents an instrumented call made while serving a request. `start` and
+    `duration` are in seconds, relative to the start of the request.
+    """
+    name: str
+    depth: int
+    start: float
+    duration: Optional[float]
+
+
+class ProfileSummary(BaseModel):
+    """
+    This class represents the profile of a request, without its sampled stacks.
+    """
+    profile_id: str
+    method: str
+    path: str
+    status_code: Optional[int]
+    started_at: float
+    duration: float
+    samples: int
+    spans: List[Span]
@@ -0,0 +1,41 @@
+"""
+Builds the item counters for the items stored before the counters existed.
+
+Run it once, from a single process, before enabling write traffic:
+
+    python -m app.reconcile_stats [--force]
+"""
+
+import sys
+import asyncio
+import argparse
+
+from fastapi import HTTPException
+
+from .services.item_service import ItemService
+
+
+def main() -> int:
+    """
+    Reconciles the item counters and prints the counts that were found.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="take over the lease left by a reconciliation that did not finish"
+    )
+    args = parser.parse_args()
+
+    try:
+        stats = asyncio.run(ItemService().reconcile_stats(force=args.force))
+    except HTTPException as err:
+        print(err.detail, file=sys.stderr)
+        return 1
+
+    print(stats.model_dump_json())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
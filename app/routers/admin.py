@@ -0,0 +1,105 @@
+"""
+This section handles the admin endpoints.
+"""
+
+from typing import Annotated, Dict, List
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi import Path
+from fastapi import status
+from fastapi.responses import PlainTextResponse
+
+from ..models import profile_models
+from ..utils.deadlines import DEADLINE_METRICS
+from ..utils.profiling import SLOW_REQUESTS, is_authorized
+
+
+def check_admin_token(x_admin_token: Annotated[str, Header()] = None):
+    """
+    Rejects the request unless the `X-Admin-Token` header matches the `PROFILE_TOKEN` setting.
+    """
+    if not is_authorized(x_admin_token):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized"
+        )
+
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+    dependencies=[Depends(check_admin_token)],
+    responses={status.HTTP_403_FORBIDDEN: {"description": "Not authorized"}},
+)
+
+
+@router.get(
+    "/profiles",
+    status_code=status.HTTP_200_OK,
+    response_description="Slowest profiled requests",
+    response_model=List[profile_models.ProfileSummary],
+    summary="List the slowest profiled requests"
+)
+async def get_profiles():
+    """
+    Lists the profiles of the slowest profiled requests, slowest first, with the breakdown of
+    the `UserService` and database calls of each one.
+    """
+    return [profile.summary() for profile in SLOW_REQUESTS.profiles()]
+
+
+@router.get(
+    "/profiles/{profile_id}/folded",
+    status_code=status.HTTP_200_OK,
+    response_class=PlainTextResponse,
+    response_description="Sampled stacks in folded format",
+    responses={status.HTTP_404_NOT_FOUND: {"description": "Profile not found"}},
+    summary="Get the sampled stacks of a request"
+)
+async def get_profile_stacks(
+    profile_id: Annotated[
+        str,
+        Path(
+            title="Profile ID",
+            description="The id of the profile to get"
+        )
+    ]
+):
+    """
+    Returns the sampled call stacks of a profiled request in folded format, one
+    `frame;frame;frame count` line per stack, ready to be rendered with flamegraph tools.
+    """
+    profile = SLOW_REQUESTS.get(profile_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    return profile.folded()
+
+
+@router.delete(
+    "/profiles",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Remove all the stored profiles"
+)
+async def clear_profiles():
+    """
+    Removes all the stored profiles.
+    """
+    SLOW_REQUESTS.clear()
+
+
+@router.get(
+    "/deadlines",
+    status_code=status.HTTP_200_OK,
+    response_description="Work abandoned because of deadlines",
+    response_model=Dict[str, float],
+    summary="Get the deadline metrics"
+)
+async def get_deadline_metrics():
+    """
+    Returns how many requests ran out of time or were abandoned by their clients, how many
+    database calls timed out or skipped their retries, and the seconds of work abandoned.
+    """
+    return DEADLINE_METRICS.snapshot()
@@ -2,9 +2,16 @@
 This section handles all item endpoints.
 """
 
-from fastapi import APIRouter
+from typing import Annotated
+from uuid import UUID
+
+from fastapi import APIRouter, Depends
+from fastapi import Path, Body
+from fastapi import status
 
 from ..models import item_models
+from ..services.item_service import ItemService
+from ..utils.deadlines import route_deadline
 
 router = APIRouter(
     prefix="/items",
@@ -13,6 +20,24 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+item_service = ItemService()
+
+
+@router.get(
+    "/stats",
+    status_code=status.HTTP_200_OK,
+    response_description="Item counts",
+    response_model=item_models.ItemStats,
+    summary="Get the number of items by type",
+    dependencies=[Depends(route_deadline(2))]
+)
+async def get_item_stats():
+    """
+    Returns the number of items in total and by type. The counts are kept up to date on every
+    create and delete, so no items are read.
+    """
+    return await item_service.get_stats()
+
 
 @router.get("{item_id}")
 async def read_item(item_id: int):
@@ -24,6 +49,55 @@ async def get_item_type(item_type: item_models.ItemType):
     return {"item_type": item_type}
 
 
-@router.post("/")
-async def create_item(item: item_models.Item):
-    return item
+@router.post(
+    "/",
+    status_code=status.HTTP_201_CREATED,
+    response_description="Item has been created",
+    response_model=item_models.ItemID,
+    summary="Create a new item",
+    dependencies=[Depends(route_deadline(3))]
+)
+async def create_item(
+    item: Annotated[
+        item_models.Item,
+        Body(
+            title="Item to create",
+            description="The item to create"
+        )
+    ]
+):
+    """
+    Creates a new item with the following information:
+
+    - `name`
+    - `description`
+    - `type`
+    """
+    return await item_service.create_item(item)
+
+
+@router.delete(
+    "/{item_id}",
+    status_code=status.HTTP_200_OK,
+    response_description="Item has been deleted",
+    response_model=item_models.ItemID,
+    summary="Delete an item",
+    dependencies=[Depends(route_deadline(3))]
+)
+async def delete_item(
+    item_id: Annotated[
+        UUID,
+        Path(
+            title="Item ID",
+            description="The ID of the item to delete"
+        )
+    ]
+):
+    """
+    Deletes the item with the specified ID.
+
+    **Returns**
+
+    - The deleted item.
+    """
+    return await item_service.delete_item(item_id)
@@ -4,12 +4,13 @@ This section is handles all the users endpoints.
 
 from typing import Annotated
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 from fastapi import Path, Body
 from fastapi import status
 
 from ..models import user_models
 from ..services.user_service import UserService
+from ..utils.deadlines import route_deadline
 
 router = APIRouter(
     prefix="/users",
@@ -25,7 +26,8 @@ user_service = UserService()
     "/{username}",
     status_code=status.HTTP_200_OK,
     response_description="User found",
-    response_model=user_models.UserInfo
+    response_model=user_models.UserInfo,
+    dependencies=[Depends(route_deadline(2))]
 )
 async def get_a_user(
     username: Annotated[
@@ -61,6 +63,7 @@ async def get_a_user(
         status.HTTP_400_BAD_REQUEST: {"description": "Bad request"}
     },
     summary="Create a new user",
+    dependencies=[Depends(route_deadline(5))]
 )
 async def create_user(
     new_user: Annotated[
@@ -92,7 +95,8 @@ async def create_user(
     status_code=status.HTTP_200_OK,
     response_description="User has been updated",
     summary="Update a user",
-    response_model=user_models.UserInfo
+    response_model=user_models.UserInfo,
+    dependencies=[Depends(route_deadline(3))]
 )
 async def update_user(
     new_data: Annotated[
@@ -133,7 +137,8 @@ async def update_user(
     status_code=status.HTTP_200_OK,
     response_description="User has been deleted",
     response_model=user_models.UserInfo,
-    summary="Delete a user"
+    summary="Delete a user",
+    dependencies=[Depends(route_deadline(3))]
 )
 async def delete_user(
     username: Annotated[
@@ -0,0 +1,228 @@
+"""
+Item service class
+"""
+
+import os
+import uuid
+import random
+import asyncio
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict
+from dotenv import load_dotenv
+
+from fastapi import HTTPException, status
+
+from ..models import item_models
+from ..db.base import ConditionFailedError, StorageBackend
+from ..db.engines import get_database
+from ..db.throttling import Priority, priority
+from ..utils.deadlines import check_deadline
+from ..utils.logs import LOGGER
+from ..utils.profiling import traced
+
+load_dotenv()
+
+
+STATS_PREFIX = "#stats#"
+LEASE_ID = f"{STATS_PREFIX}lease"
+
+
+class ItemService:
+    """
+    Item service class for all the logic methods of items.
+
+    The number of items of every type is kept in sharded counters, stored in the items table
+    with an `item_id` starting with `#stats#`. Every create or delete writes the item and adds
+    to a random shard of its counter in one transaction, so there is no hot key, and reading
+    the stats only reads `ItemType × shards` counters.
+    """
+
+    def __init__(self, database: StorageBackend = None):
+        self.database = database or get_database(key_schema=["item_id"], indexes=["type"])
+        self.table_name = os.getenv("DB_ITEMS_TABLE_NAME")
+        self.shards = int(os.getenv("STATS_SHARDS", "10"))
+        self.scan_segments = int(os.getenv("STATS_SCAN_SEGMENTS", "4"))
+
+    async def __check_db(self):
+        check_deadline("check_if_table_exists")
+        if not await self.database.check_if_table_exists(self.table_name):
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Table {self.table_name} not found"
+            )
+
+    @staticmethod
+    def __counter_id(item_type: item_models.ItemType, shard: int) -> str:
+        return f"{STATS_PREFIX}{item_type.value}#{shard}"
+
+    def __count(self, item_type: item_models.ItemType, delta: int) -> Dict:
+        return {
+            'Update': {
+                'Key': {'item_id': self.__counter_id(item_type, random.randrange(self.shards))},
+                'UpdateExpression': "SET item_type = :item_type ADD item_count :delta",
+                'ExpressionAttributeValues': {
+                    ':item_type': item_type.value,
+                    ':delta': delta
+                }
+            }
+        }
+
+    async def __counted(self) -> Dict[item_models.ItemType, int]:
+        counters = await self.database.batch_get_items([
+            {'item_id': self.__counter_id(item_type, shard)}
+            for item_type in item_models.ItemType
+            for shard in range(self.shards)
+        ])
+
+        by_type = {item_type: 0 for item_type in item_models.ItemType}
+        for counter in counters:
+            by_type[item_models.ItemType(counter['item_type'])] += int(counter['item_count'])
+        return by_type
+
+    @traced("ItemService.create_item")
+    async def create_item(self, item: item_models.Item) -> item_models.ItemID:
+        """
+        The `create_item` method stores a new item and increments the counter of its type in
+        the same transaction.
+
+        Params
+            - item Item: The item to create
+
+        Returns
+            - The created item with its ID.
+        """
+        await self.__check_db()
+
+        new_item = item_models.ItemID(item_id=uuid.uuid4(), **item.model_dump())
+        await self.database.transact_write_items([
+            {'Put': {'Item': new_item, 'ConditionExpression': 'attribute_not_exists(item_id)'}},
+            self.__count(new_item.type, 1)
+        ])
+
+        return new_item
+
+    @traced("ItemService.delete_item")
+    async def delete_item(self, item_id: uuid.UUID) -> item_models.ItemID:
+        """
+        The `delete_item` method deletes an item and decrements the counter of its type in the
+        same transaction.
+
+        Params
+            - item_id UUID: The ID of the item to delete
+
+        Returns
+            - The deleted item.
+        """
+        await self.__check_db()
+
+        stored_item = await self.database.get_item_info(["item_id"], [str(item_id)])
+        if not stored_item:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Item does not exist"
+            )
+
+        deleted_item = item_models.ItemID(**stored_item)
+        try:
+            await self.database.transact_write_items([
+                {
+                    'Delete': {
+                        'Key': {'item_id': str(item_id)},
+                        'ConditionExpression': 'attribute_exists(item_id)'
+                    }
+                },
+                self.__count(deleted_item.type, -1)
+            ])
+        except ConditionFailedError as err:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Item does not exist"
+            ) from err
+
+        return deleted_item
+
+    @traced("ItemService.get_stats")
+    async def get_stats(self) -> item_models.ItemStats:
+        """
+        The `get_stats` method adds up the sharded counters of every item type, without reading
+        the items.
+
+        Returns
+            - The number of items in total and by type.
+        """
+        await self.__check_db()
+
+        by_type = await self.__counted()
+        return item_models.ItemStats(total=sum(by_type.values()), by_type=by_type)
+
+    async def __acquire_lease(self, force: bool):
+        if force:
+            await self.database.transact_write_items([{'Delete': {'Key': {'item_id': LEASE_ID}}}])
+        try:
+            await self.database.transact_write_items([
+                {
+                    'Put': {
+                        'Item': {
+                            'item_id': LEASE_ID,
+                            'acquired_at': datetime.now(timezone.utc).isoformat()
+                        },
+                        'ConditionExpression': 'attribute_not_exists(item_id)'
+                    }
+                }
+            ])
+        except ConditionFailedError as err:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="The item stats are already being reconciled"
+            ) from err
+
+    async def __release_lease(self):
+        await self.database.transact_write_items([{'Delete': {'Key': {'item_id': LEASE_ID}}}])
+
+    async def reconcile_stats(self, force: bool = False) -> item_models.ItemStats:
+        """
+        The `reconcile_stats` method builds the counters for the items that were stored before
+        the counters existed. Creates and deletes keep the counters exact on their own, so this
+        is a one-off job, run with `python -m app.reconcile_stats`, not a periodic one.
+
+        The items table is read with a parallel scan at batch priority, and the difference
+        between the scanned count and the current sum of the shards is added to one shard. A
+        scan is not a snapshot of the table, so the job should run before write traffic is
+        enabled. Only one run at a time is allowed, through a lease item in the items table.
+
+        Params
+            - force bool: Whether to take over the lease left by a run that did not finish
+
+        Returns
+            - The number of items in total and by type that were found.
+        """
+        await self.__check_db()
+        await self.__acquire_lease(force)
+
+        try:
+            with priority(Priority.BATCH):
+                segments = await asyncio.gather(*[
+                    self.database.scan_segment(segment, self.scan_segments)
+                    for segment in range(self.scan_segments)
+                ])
+
+                counts = Counter(
+                    item['type'] for segment in segments for item in segment
+                    if not item['item_id'].startswith(STATS_PREFIX)
+                )
+                by_type = {
+                    item_type: counts.get(item_type.value, 0)
+                    for item_type in item_models.ItemType
+                }
+
+                counted = await self.__counted()
+                for item_type, count in by_type.items():
+                    drift = count - counted[item_type]
+                    if drift:
+                        LOGGER.warning("Correcting the %s counter by %d", item_type.value, drift)
+                        await self.database.transact_write_items([self.__count(item_type, drift)])
+        finally:
+            await self.__release_lease()
+
+        return item_models.ItemStats(total=sum(by_type.values()), by_type=by_type)
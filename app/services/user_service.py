@@ -9,8 +9,11 @@ from dotenv import load_dotenv
 from fastapi import HTTPException, status
 
 from ..models import user_models
-from ..db.dynamo_db import DynamoDB
+from ..db.base import StorageBackend
+from ..db.engines import get_database
+from ..utils.deadlines import check_deadline
 from ..utils.passwords import get_password_hash
+from ..utils.profiling import traced
 
 load_dotenv()
 
@@ -20,17 +23,19 @@ class UserService:
     User service class for all the logic methods of users
     """
 
-    def __init__(self):
-        self.dynamodb = DynamoDB()
+    def __init__(self, database: StorageBackend = None):
+        self.database = database or get_database()
         self.table_name = os.getenv("DB_TABLE_NAME")
 
-    def __check_db(self):
-        if not self.dynamodb.check_if_table_exists(self.table_name):
+    async def __check_db(self):
+        check_deadline("check_if_table_exists")
+        if not await self.database.check_if_table_exists(self.table_name):
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Table {self.table_name} not found"
             )
 
+    @traced("UserService.check_user_exist")
     async def check_user_exist(self, user_data: str, user_identifier: str = "username") -> bool:
         """
         The method `check_user_exist` checks if a user already exists in the database based on their
@@ -45,13 +50,14 @@ class UserService:
             - A boolean value. If there are any users found with the same username or email as the
                 provided user, it will return True. Otherwise, it will return False.
         """
-        users = await self.dynamodb.scan_item(user_identifier, user_data)
+        users = await self.database.scan_item(user_identifier, user_data)
 
         if users:
             return True
 
         return False
 
+    @traced("UserService.create_user")
     async def create_user(self, user: user_models.UserPassword) -> user_models.User:
         """
         The `create_user` method creates a new user in a database, checking if the username or email
@@ -63,6 +69,7 @@ class UserService:
         Returns 
             - A new user object of type `User` of the created user.
         """
+        check_deadline("bcrypt.hash")
         new_user = user_models.UserID(
             user_id=uuid.uuid4(),
             username=user.username,
@@ -73,7 +80,7 @@ class UserService:
             age=user.age
         )
 
-        self.__check_db()
+        await self.__check_db()
 
         user_exist = await self.check_user_exist(new_user.username)
         email_exist = await self.check_user_exist(new_user.email, "email")
@@ -84,10 +91,11 @@ class UserService:
                 status_code=status.HTTP_409_CONFLICT,
                 detail=msg
             )
-        await self.dynamodb.create_item(new_user)
+        await self.database.create_item(new_user)
 
         return new_user
 
+    @traced("UserService.get_user")
     async def get_user(self, username: str) -> user_models.UserInfo:
         """
         The method `get_user` retrieves user data from a database based on a given username and 
@@ -100,9 +108,9 @@ class UserService:
         Returns 
             - An instance of the `user_models.UserData` class.
         """
-        self.__check_db()
+        await self.__check_db()
 
-        user = await self.dynamodb.get_item_info(
+        user = await self.database.get_item_info(
             ["username"],
             [username],
             [
@@ -122,6 +130,7 @@ class UserService:
 
         return user_models.UserInfo(**user)
 
+    @traced("UserService.update_user")
     async def update_user(self, username: str, new_data: user_models.UserInfo):
         """
         The `update_user` method updates the user information in the database with the provided 
@@ -137,8 +146,8 @@ class UserService:
             - An instance of the `UserInfo` class with the updated user information.
         """
 
-        self.__check_db()
-        updated_user = await self.dynamodb.update_item(
+        await self.__check_db()
+        updated_user = await self.database.update_item(
             {'username': username},
             "Set email = :email, first_name = :first_name, last_name = :last_name, age = :age",
             {
@@ -151,8 +160,9 @@ class UserService:
 
         return user_models.UserInfo(username=username, **updated_user)
 
+    @traced("UserService.delete_user")
     async def delete_user(self, username: str) -> user_models.UserID:
-        self.__check_db()
+        await self.__check_db()
 
         user_exist = await self.check_user_exist(username)
 
@@ -162,5 +172,5 @@ class UserService:
                 detail="User does not exist"
             )
 
-        deleted_user = await self.dynamodb.delete_item({'username': username})
+        deleted_user = await self.database.delete_item({'username': username})
         return user_models.UserID(**deleted_user)
@@ -0,0 +1,253 @@
+"""
+Request deadlines and cancellation of abandoned work
+"""
+
+import os
+import time
+import asyncio
+import threading
+from contextvars import ContextVar
+from typing import Dict, Optional
+from dotenv import load_dotenv
+
+from .logs import LOGGER
+from .profiling import in_profiled_thread
+
+load_dotenv()
+
+
+class DeadlineConfig:
+    """
+    This class is used to configure the request deadlines.
+
+    `REQUEST_TIMEOUT` is the time budget in seconds of the requests that do not send the
+    `X-Request-Timeout` header and whose route has no default, and `MAX_REQUEST_TIMEOUT` caps
+    the budget a client can ask for.
+    """
+    REQUEST_TIMEOUT = float(os.getenv('REQUEST_TIMEOUT', '10'))
+    MAX_REQUEST_TIMEOUT = float(os.getenv('MAX_REQUEST_TIMEOUT', '60'))
+
+
+DEADLINE_HEADER = "x-request-timeout"
+
+
+class DeadlineExceeded(Exception):
+    """
+    Raised when there is not enough time left in the request budget to do some work.
+    """
+
+    def __init__(self, operation: str):
+        super().__init__(f"Deadline exceeded before {operation}")
+        self.operation = operation
+
+
+class Deadline:
+    """
+    This class holds the time budget of a request.
+
+    The `start` and `expires_at` attributes are `time.monotonic` timestamps.
+    The `from_header` attribute tells if the budget was set by the client, in which case the
+    route defaults do not change it.
+    """
+
+    def __init__(self, timeout: float, from_header: bool = False):
+        self.start = time.monotonic()
+        self.expires_at = self.start + timeout
+        self.from_header = from_header
+
+    def remaining(self) -> float:
+        """
+        Returns the seconds left before the deadline, which can be negative.
+        """
+        return self.expires_at - time.monotonic()
+
+    def elapsed(self) -> float:
+        """
+        Returns the seconds elapsed since the request started.
+        """
+        return time.monotonic() - self.start
+
+
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar("current_deadline", default=None)
+
+
+class DeadlineMetrics:
+    """
+    This class counts the work abandoned because of deadlines and client disconnections.
+
+    `abandoned_seconds` adds up the time already spent on the requests that were abandoned.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {
+            "deadline_exceeded": 0,
+            "client_disconnected": 0,
+            "calls_timed_out": 0,
+            "retries_skipped": 0,
+            "abandoned_seconds": 0.0,
+        }
+
+    def record(self, counter: str, abandoned_seconds: float = 0.0):
+        """
+        Increments a counter and adds the seconds of work that were abandoned.
+        """
+        with self._lock:
+            self._counters[counter] += 1
+            self._counters["abandoned_seconds"] += abandoned_seconds
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        Returns a copy of the counters.
+        """
+        with self._lock:
+            return dict(self._counters)
+
+
+DEADLINE_METRICS = DeadlineMetrics()
+
+
+def remaining_time() -> Optional[float]:
+    """
+    The function `remaining_time` returns the seconds left in the budget of the current request.
+
+    Returns
+        - The seconds left, or `None` when the code is not running inside a request.
+    """
+    deadline = _current_deadline.get()
+    return deadline.remaining() if deadline is not None else None
+
+
+def elapsed_time() -> float:
+    """
+    The function `elapsed_time` returns the seconds spent so far on the current request.
+
+    Returns
+        - The seconds elapsed, or 0 when the code is not running inside a request.
+    """
+    deadline = _current_deadline.get()
+    return deadline.elapsed() if deadline is not None else 0.0
+
+
+def check_deadline(operation: str, needed: float = 0.0):
+    """
+    The function `check_deadline` makes sure the current request still has time to run an
+    operation.
+
+    Params
+        - operation str: The name of the operation, used in the error
+        - needed float: The seconds the operation needs before it can start
+
+    Raises
+        - DeadlineExceeded if the time left is not more than `needed`.
+    """
+    remaining = remaining_time()
+    if remaining is not None and remaining <= needed:
+        raise DeadlineExceeded(operation)
+
+
+async def run_with_deadline(operation: str, func, *args, **kwargs):
+    """
+    The function `run_with_deadline` runs a blocking call in a worker thread, giving up on it
+    when the current request runs out of time.
+
+    Params
+        - operation str: The name of the operation, used in the error
+        - func: The blocking function to call
+        - args, kwargs: The arguments of the function
+
+    Returns
+        - The value returned by the function.
+    """
+    check_deadline(operation)
+    func = in_profiled_thread(func)
+    remaining = remaining_time()
+    if remaining is None:
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+    try:
+        return await asyncio.wait_for(asyncio.to_thread(func, *args, **kwargs), remaining)
+    except asyncio.TimeoutError as err:
+        DEADLINE_METRICS.record("calls_timed_out")
+        raise DeadlineExceeded(operation) from err
+
+
+def route_deadline(timeout: float):
+    """
+    The function `route_deadline` builds a dependency that sets the default time budget of a
+    route. Requests that send the `X-Request-Timeout` header keep the budget they asked for.
+
+    Params
+        - timeout float: The time budget of the route in seconds
+    """
+    async def set_route_deadline():
+        deadline = _current_deadline.get()
+        if deadline is not None and not deadline.from_header:
+            deadline.expires_at = deadline.start + timeout
+
+    return set_route_deadline
+
+
+def _request_deadline(headers) -> Deadline:
+    for name, value in headers:
+        if name.decode("latin-1").lower() == DEADLINE_HEADER:
+            try:
+                timeout = float(value)
+            except ValueError:
+                break
+            if timeout > 0:
+                return Deadline(min(timeout, DeadlineConfig.MAX_REQUEST_TIMEOUT), from_header=True)
+    return Deadline(DeadlineConfig.REQUEST_TIMEOUT)
+
+
+class DeadlineMiddleware:
+    """
+    This ASGI middleware sets the deadline of every request and cancels the request handler
+    when the client disconnects before the response is complete.
+
+    The incoming messages are read by a listener task and handed to the app through a queue,
+    so the listener sees the disconnection without taking the body away from the app.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        deadline = _request_deadline(scope.get("headers", []))
+        token = _current_deadline.set(deadline)
+        messages = asyncio.Queue()
+        response_complete = False
+
+        async def send_wrapper(message):
+            nonlocal response_complete
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_complete = True
+            await send(message)
+
+        handler = asyncio.ensure_future(self.app(scope, messages.get, send_wrapper))
+
+        async def listen_for_disconnect():
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    if not response_complete and not handler.done():
+                        handler.cancel()
+                    return
+
+        listener = asyncio.ensure_future(listen_for_disconnect())
+        try:
+            await handler
+        except asyncio.CancelledError:
+            if not listener.done():
+                raise
+            DEADLINE_METRICS.record("client_disconnected", deadline.elapsed())
+            LOGGER.warning("Client disconnected, abandoned %s %s after %.3fs",
+                           scope["method"], scope["path"], deadline.elapsed())
+        finally:
+            listener.cancel()
+            _current_deadline.reset(token)
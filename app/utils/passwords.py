@@ -4,9 +4,12 @@ This file will handle all the logic related to passwords
 
 from passlib.context import CryptContext
 
+from .profiling import traced
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
+@traced("bcrypt.hash")
 def get_password_hash(password):
     """
     The function `get_password_hash` takes a password as input and returns its hash value.
@@ -20,6 +23,7 @@ def get_password_hash(password):
     return pwd_context.hash(password)
 
 
+@traced("bcrypt.verify")
 def verify_password(plain_password, hashed_password):
     """
     The function `verify_password` takes a plain password and a hashed password as input and returns
@@ -0,0 +1,370 @@
+"""
+On-demand request profiling
+"""
+
+import os
+import sys
+import time
+import heapq
+import random
+import inspect
+import secrets
+import functools
+import threading
+import itertools
+import asyncio
+import weakref
+from collections import Counter
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class ProfilingConfig:
+    """
+    This class is used to configure the request profiling.
+
+    `PROFILE_SAMPLE_RATE` is the fraction of requests profiled at random, `PROFILE_TOKEN` is the
+    secret that enables profiling through the `X-Profile` header and protects the admin endpoints
+    (they are disabled when it is not set), `PROFILE_SLOWEST` is how many profiles are kept and
+    `PROFILE_INTERVAL` is the sampling interval in seconds.
+    """
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+    PROFILE_TOKEN = os.getenv('PROFILE_TOKEN')
+    PROFILE_SLOWEST = int(os.getenv('PROFILE_SLOWEST', '10'))
+    PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', '0.005'))
+
+
+PROFILE_HEADER = "X-Profile"
+
+
+class RequestProfile:
+    """
+    This class holds the profile of a single request.
+
+    The `spans` attribute is the breakdown of the instrumented calls, in the order they started.
+    The `stacks` attribute counts the sampled call stacks in flamegraph folded format.
+    The `tasks` and `threads` attributes are the asyncio tasks and worker threads running work
+    of this request. Only their stacks are sampled, so concurrent requests do not show up in
+    the profile.
+    """
+
+    def __init__(self, method: str, path: str):
+        self.profile_id = secrets.token_hex(8)
+        self.method = method
+        self.path = path
+        self.status_code = None
+        self.started_at = time.time()
+        self.duration = 0.0
+        self.spans: List[Dict] = []
+        self.stacks: Counter = Counter()
+        self.tasks = weakref.WeakSet()
+        self.threads = set()
+        self._start = time.perf_counter()
+        self._depth = 0
+
+    def elapsed(self) -> float:
+        """
+        Returns the seconds elapsed since the request started.
+        """
+        return time.perf_counter() - self._start
+
+    def folded(self) -> str:
+        """
+        Returns the sampled stacks in the folded format used by flamegraph tools, one
+        `frame;frame;frame count` line per stack.
+        """
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def summary(self) -> Dict:
+        """
+        Returns the profile without the sampled stacks.
+        """
+        return {
+            "profile_id": self.profile_id,
+            "method": self.method,
+            "path": self.path,
+            "status_code": self.status_code,
+            "started_at": self.started_at,
+            "duration": self.duration,
+            "samples": sum(self.stacks.values()),
+            "spans": self.spans,
+        }
+
+
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar(
+    "current_profile", default=None
+)
+
+
+class _Span:
+    def __init__(self, name: str):
+        self.name = name
+        self.profile = None
+        self.record = None
+
+    def __enter__(self):
+        self.profile = _current_profile.get()
+        if self.profile is not None:
+            self.record = {
+                "name": self.name,
+                "depth": self.profile._depth,  # pylint: disable=protected-access
+                "start": self.profile.elapsed(),
+                "duration": None,
+            }
+            self.profile.spans.append(self.record)
+            self.profile._depth += 1  # pylint: disable=protected-access
+        return self
+
+    def __exit__(self, *exc):
+        if self.profile is not None:
+            self.record["duration"] = self.profile.elapsed() - self.record["start"]
+            self.profile._depth -= 1  # pylint: disable=protected-access
+        return False
+
+
+def install_task_tracking(loop: asyncio.AbstractEventLoop):
+    """
+    The function `install_task_tracking` sets a task factory on the event loop that links the
+    tasks created while serving a profiled request to its profile, so the sampler knows when
+    the event loop is running work of that request.
+
+    Params
+        - loop AbstractEventLoop: The event loop serving the requests
+    """
+    previous = loop.get_task_factory()
+
+    def task_factory(task_loop, coro, **kwargs):
+        if previous is not None:
+            task = previous(task_loop, coro, **kwargs)
+        else:
+            task = asyncio.Task(coro, loop=task_loop, **kwargs)
+        profile = _current_profile.get()
+        if profile is not None:
+            profile.tasks.add(task)
+        return task
+
+    loop.set_task_factory(task_factory)
+
+
+def in_profiled_thread(func):
+    """
+    The function `in_profiled_thread` wraps a function that runs in a worker thread, so while it
+    runs the thread is sampled as part of the profile of the request that started it.
+
+    Params
+        - func: The function to run in the worker thread
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = _current_profile.get()
+        if profile is None:
+            return func(*args, **kwargs)
+        thread_id = threading.get_ident()
+        profile.threads.add(thread_id)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.threads.discard(thread_id)
+    return wrapper
+
+
+def traced(name: str):
+    """
+    The function `traced` is a decorator that records every call of a function, sync or async,
+    as a span of the current request profile.
+
+    Params
+        - name str: The name of the span in the breakdown
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with _Span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _Span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class _Sampler:
+    """
+    Samples, from a background thread and at a fixed interval, the event loop while it runs a
+    task of the request and the worker threads running calls of the request.
+    """
+
+    def __init__(self, profile: RequestProfile, interval: float):
+        self.profile = profile
+        self.interval = interval
+        self.loop = asyncio.get_running_loop()
+        self.thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def _fold(frame) -> str:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{os.path.basename(code.co_filename)}:{code.co_qualname}")
+            frame = frame.f_back
+        return ";".join(reversed(names)).replace(" ", "_")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()  # pylint: disable=protected-access
+            thread_ids = list(self.profile.threads)
+            if asyncio.current_task(self.loop) in self.profile.tasks:
+                thread_ids.append(self.thread_id)
+            for thread_id in thread_ids:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self.profile.stacks[self._fold(frame)] += 1
+
+    def start(self):
+        """
+        Starts sampling the current thread.
+        """
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops sampling and waits for the sampler thread to finish.
+        """
+        self._stop.set()
+        self._thread.join()
+
+
+class SlowRequestStore:
+    """
+    This class keeps the profiles of the slowest requests seen so far.
+
+    The `capacity` attribute is the number of profiles kept.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._heap = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def add(self, profile: RequestProfile):
+        """
+        Stores a profile if it is one of the `capacity` slowest ones.
+        """
+        entry = (profile.duration, next(self._counter), profile)
+        with self._lock:
+            if len(self._heap) < self.capacity:
+                heapq.heappush(self._heap, entry)
+            elif self._heap and entry[0] > self._heap[0][0]:
+                heapq.heapreplace(self._heap, entry)
+
+    def profiles(self) -> List[RequestProfile]:
+        """
+        Returns the stored profiles, slowest first.
+        """
+        with self._lock:
+            return [entry[2] for entry in sorted(self._heap, reverse=True)]
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        """
+        Returns the stored profile with the given id, or `None` if it is not stored.
+        """
+        with self._lock:
+            for _, _, profile in self._heap:
+                if profile.profile_id == profile_id:
+                    return profile
+        return None
+
+    def clear(self):
+        """
+        Removes all the stored profiles.
+        """
+        with self._lock:
+            self._heap.clear()
+
+
+SLOW_REQUESTS = SlowRequestStore(ProfilingConfig.PROFILE_SLOWEST)
+
+
+def is_authorized(token: Optional[str]) -> bool:
+    """
+    The function `is_authorized` checks a token against the `PROFILE_TOKEN` setting.
+
+    Params
+        - token str: The token sent by the client
+
+    Returns
+        - True if profiling is configured with a token and the token matches, False otherwise.
+    """
+    expected = ProfilingConfig.PROFILE_TOKEN
+    return bool(expected and token) and secrets.compare_digest(expected.encode(), token.encode())
+
+
+def should_profile(header_token: Optional[str]) -> bool:
+    """
+    The function `should_profile` decides if a request is profiled, either because it carries
+    an authorized `X-Profile` header or because it was picked by the sample rate.
+
+    Params
+        - header_token str: The value of the `X-Profile` header of the request
+
+    Returns
+        - True if the request has to be profiled.
+    """
+    if header_token is not None and is_authorized(header_token):
+        return True
+    return random.random() < ProfilingConfig.PROFILE_SAMPLE_RATE
+
+
+def _header(scope, name: str) -> Optional[str]:
+    name = name.lower().encode("latin-1")
+    for key, value in scope.get("headers", []):
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return None
+
+
+class ProfilingMiddleware:
+    """
+    This ASGI middleware profiles a sampled fraction of the requests, and the requests that
+    carry an authorized `X-Profile` header, sampling their call stacks and recording their
+    spans. The slowest profiles are served by the `/admin/profiles` endpoints.
+
+    Requests that are not profiled are passed to the app untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not should_profile(_header(scope, PROFILE_HEADER)):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"])
+        profile.tasks.add(asyncio.current_task())
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                profile.status_code = message["status"]
+            await send(message)
+
+        token = _current_profile.set(profile)
+        sampler = _Sampler(profile, ProfilingConfig.PROFILE_INTERVAL)
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop()
+            profile.duration = profile.elapsed()
+            _current_profile.reset(token)
+            SLOW_REQUESTS.add(profile)
@@ -0,0 +1,24 @@
+"""
+Tests of the DynamoDB engine that run without DynamoDB
+"""
+
+import pytest
+
+from app.db import dynamo_db
+from app.db.config import Config
+
+
+@pytest.mark.parametrize("remaining", [None, 0.1, 1.5, 4.0, 3600.0])
+def test_call_timeout_is_capped_by_the_setting(monkeypatch, remaining):
+    monkeypatch.setattr(dynamo_db, "remaining_time", lambda: remaining)
+
+    timeout = dynamo_db.call_timeout()
+
+    assert timeout in dynamo_db.CALL_TIMEOUTS
+    assert timeout <= Config.DB_CALL_TIMEOUT
+    if remaining is not None and remaining <= Config.DB_CALL_TIMEOUT:
+        assert timeout >= remaining
+
+
+def test_call_timeouts_are_capped_by_the_setting():
+    assert max(dynamo_db.CALL_TIMEOUTS) == Config.DB_CALL_TIMEOUT
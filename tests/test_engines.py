@@ -0,0 +1,172 @@
+"""
+Tests that the local engines follow the semantics of DynamoDB
+"""
+
+import asyncio
+
+import pytest
+
+from app.db.base import ConditionFailedError, parse_update_expression
+from app.db.memory_db import MemoryDB
+from app.db.sqlite_db import SQLiteDB
+
+ALICE = {'username': 'alice', 'email': 'alice@example.com', 'visits': 1}
+BOB = {'username': 'bob', 'email': 'bob@example.com', 'visits': 2}
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def database(request, tmp_path):
+    if request.param == "memory":
+        engine = MemoryDB(key_schema=["username"], indexes=["email"])
+    else:
+        engine = SQLiteDB(
+            str(tmp_path / "users.db"), key_schema=["username"], indexes=["email"]
+        )
+
+    async def setup():
+        assert await engine.check_if_table_exists("users")
+        await engine.batch_create_items([ALICE, BOB])
+    asyncio.run(setup())
+    return engine
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_update_expressions_are_split_into_sets_and_increments():
+    updates, increments = parse_update_expression(
+        "SET email = :email, name = :name ADD visits :one",
+        {':email': 'a@b.c', ':name': 'A', ':one': 1}
+    )
+
+    assert updates == {'email': 'a@b.c', 'name': 'A'}
+    assert increments == {'visits': 1}
+
+
+@pytest.mark.parametrize("expression", ["email = :email", "SET email = :missing", "REMOVE email"])
+def test_unsupported_update_expressions_are_rejected(expression):
+    with pytest.raises(ValueError):
+        parse_update_expression(expression, {':email': 'a@b.c'})
+
+
+def test_get_item_returns_the_item_or_none(database):
+    assert run(database.get_item_info(['username'], ['alice'])) == ALICE
+    assert run(database.get_item_info(['username'], ['carol'])) is None
+
+
+def test_get_item_projects_the_attributes(database):
+    found = run(database.get_item_info(['username'], ['alice'], ['email', 'phone']))
+
+    assert found == {'email': 'alice@example.com'}
+
+
+def test_returned_items_are_copies(database):
+    found = run(database.get_item_info(['username'], ['alice']))
+    found['visits'] = 100
+
+    assert run(database.get_item_info(['username'], ['alice']))['visits'] == 1
+
+
+def test_create_item_replaces_the_item(database):
+    run(database.create_item({'username': 'alice', 'email': 'new@example.com'}))
+
+    assert run(database.get_item_info(['username'], ['alice'])) == {
+        'username': 'alice', 'email': 'new@example.com'
+    }
+    assert run(database.scan_item('email', 'alice@example.com')) == []
+
+
+@pytest.mark.parametrize("key", ["email", "visits"])
+def test_scan_item_finds_indexed_and_plain_attributes(database, key):
+    assert run(database.scan_item(key, BOB[key])) == [BOB]
+
+
+def test_query_items_by_partition_key_and_index(database):
+    assert run(database.query_items('username', 'bob')) == [BOB]
+    assert run(database.query_items('username', 'carol')) == []
+    assert run(database.query_items('email', 'bob@example.com', 'email-index')) == [BOB]
+
+
+def test_update_item_returns_the_updated_attributes(database):
+    updated = run(database.update_item(
+        {'username': 'alice'},
+        "SET email = :email ADD visits :one",
+        {':email': 'alice@new.com', ':one': 1}
+    ))
+
+    assert updated == {'email': 'alice@new.com', 'visits': 2}
+    assert run(database.get_item_info(['username'], ['alice'])) == dict(
+        ALICE, email='alice@new.com', visits=2
+    )
+    assert run(database.query_items('email', 'alice@new.com', 'email-index')) == [
+        dict(ALICE, email='alice@new.com', visits=2)
+    ]
+
+
+def test_update_item_creates_missing_items(database):
+    updated = run(database.update_item({'username': 'carol'}, "ADD visits :one", {':one': 1}))
+
+    assert updated == {'visits': 1}
+    assert run(database.get_item_info(['username'], ['carol'])) == {
+        'username': 'carol', 'visits': 1
+    }
+
+
+def test_delete_item_returns_the_old_item(database):
+    assert run(database.delete_item({'username': 'alice'})) == ALICE
+    assert run(database.get_item_info(['username'], ['alice'])) is None
+    assert run(database.scan_item('email', 'alice@example.com')) == []
+
+
+def test_delete_item_fails_on_missing_items(database):
+    with pytest.raises(KeyError) as err:
+        run(database.delete_item({'username': 'carol'}))
+
+    assert err.value.args == ('Attributes',)
+
+
+def test_transactions_apply_every_write(database):
+    run(database.transact_write_items([
+        {'Put': {
+            'Item': {'username': 'carol', 'email': 'carol@example.com'},
+            'ConditionExpression': 'attribute_not_exists(username)'
+        }},
+        {'Delete': {'Key': {'username': 'bob'}, 'ConditionExpression': 'attribute_exists(username)'}},
+        {'Update': {
+            'Key': {'username': 'alice'},
+            'UpdateExpression': "ADD visits :one",
+            'ExpressionAttributeValues': {':one': 1}
+        }},
+    ]))
+
+    assert run(database.get_item_info(['username'], ['carol'])) is not None
+    assert run(database.get_item_info(['username'], ['bob'])) is None
+    assert run(database.get_item_info(['username'], ['alice']))['visits'] == 2
+
+
+def test_transactions_apply_nothing_when_a_condition_fails(database):
+    with pytest.raises(ConditionFailedError):
+        run(database.transact_write_items([
+            {'Update': {
+                'Key': {'username': 'alice'},
+                'UpdateExpression': "ADD visits :one",
+                'ExpressionAttributeValues': {':one': 1}
+            }},
+            {'Put': {'Item': BOB, 'ConditionExpression': 'attribute_not_exists(username)'}},
+        ]))
+
+    assert run(database.get_item_info(['username'], ['alice'])) == ALICE
+
+
+def test_scan_segments_split_the_table(database):
+    segments = [run(database.scan_segment(segment, 3)) for segment in range(3)]
+
+    found = sorted(item['username'] for segment in segments for item in segment)
+    assert found == ['alice', 'bob']
+
+
+def test_batch_get_items_skips_missing_items(database):
+    found = run(database.batch_get_items([{'username': 'bob'}, {'username': 'carol'}]))
+
+    assert found == [BOB]
@@ -0,0 +1,133 @@
+"""
+Tests of the item service and its counters on the local engines
+"""
+
+import uuid
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.db.memory_db import MemoryDB
+from app.db.sqlite_db import SQLiteDB
+from app.models.item_models import Item, ItemType
+from app.services.item_service import ItemService
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def database(request, tmp_path):
+    if request.param == "memory":
+        return MemoryDB(key_schema=["item_id"], indexes=["type"])
+    return SQLiteDB(str(tmp_path / "items.db"), key_schema=["item_id"], indexes=["type"])
+
+
+@pytest.fixture
+def service(database, monkeypatch):
+    monkeypatch.setenv("DB_ITEMS_TABLE_NAME", "items")
+    monkeypatch.setenv("STATS_SHARDS", "3")
+    return ItemService(database)
+
+
+def book(name="Dune"):
+    return Item(name=name, description="A book", type=ItemType.BOOK)
+
+
+def by_type(stats):
+    return {item_type.value: count for item_type, count in stats.by_type.items()}
+
+
+def test_created_items_are_counted(service):
+    async def run():
+        for _ in range(4):
+            await service.create_item(book())
+        await service.create_item(Item(name="Bread", description="Food", type=ItemType.FOOD))
+        return await service.get_stats()
+
+    stats = asyncio.run(run())
+
+    assert stats.total == 5
+    assert by_type(stats) == {"book": 4, "food": 1, "medical": 0, "other": 0}
+
+
+def test_deleted_items_are_uncounted(service):
+    async def run():
+        created = await service.create_item(book())
+        await service.create_item(book("Emma"))
+        deleted = await service.delete_item(created.item_id)
+        return created, deleted, await service.get_stats()
+
+    created, deleted, stats = asyncio.run(run())
+
+    assert deleted == created
+    assert stats.total == 1
+    assert by_type(stats)["book"] == 1
+
+
+def test_deleting_a_missing_item_is_not_found(service):
+    with pytest.raises(HTTPException) as err:
+        asyncio.run(service.delete_item(uuid.uuid4()))
+
+    assert err.value.status_code == 404
+
+
+def test_deleting_an_item_deleted_meanwhile_is_not_found(service, database):
+    async def run():
+        created = await service.create_item(book())
+        stored = await database.get_item_info(["item_id"], [str(created.item_id)])
+        await service.delete_item(created.item_id)
+
+        async def stale_item_info(*_):
+            return stored
+        database.get_item_info = stale_item_info
+
+        with pytest.raises(HTTPException) as err:
+            await service.delete_item(created.item_id)
+        return err.value, await service.get_stats()
+
+    err, stats = asyncio.run(run())
+
+    assert err.status_code == 404
+    assert stats.total == 0
+
+
+def test_reconcile_counts_items_stored_before_the_counters(service, database):
+    async def run():
+        await service.create_item(book())
+        await database.create_item({'item_id': str(uuid.uuid4()), **book("Emma").model_dump()})
+        await database.create_item({'item_id': str(uuid.uuid4()), **book("Ulysses").model_dump()})
+        before = await service.get_stats()
+        reconciled = await service.reconcile_stats()
+        return before, reconciled, await service.get_stats(), await service.reconcile_stats()
+
+    before, reconciled, after, again = asyncio.run(run())
+
+    assert before.total == 1
+    assert reconciled.total == 3
+    assert by_type(after) == {"book": 3, "food": 0, "medical": 0, "other": 0}
+    assert again == after
+
+
+def test_reconcile_runs_once_at_a_time(service, database):
+    other = ItemService(database)
+    counted = database.batch_get_items
+
+    async def slow_batch_get_items(item_keys):
+        await asyncio.sleep(0.01)
+        return await counted(item_keys)
+    database.batch_get_items = slow_batch_get_items
+
+    async def run():
+        await database.check_if_table_exists("items")
+        await database.create_item({'item_id': str(uuid.uuid4()), **book().model_dump()})
+        results = await asyncio.gather(
+            service.reconcile_stats(),
+            other.reconcile_stats(),
+            return_exceptions=True
+        )
+        return results, await service.get_stats()
+
+    (first, second), stats = asyncio.run(run())
+
+    assert first.total == 1
+    assert isinstance(second, HTTPException) and second.status_code == 409
+    assert stats.total == 1
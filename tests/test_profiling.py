@@ -0,0 +1,56 @@
+"""
+Tests of the profiling tokens
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.utils.profiling import SLOW_REQUESTS, ProfilingConfig, is_authorized
+
+NON_ASCII_TOKEN = "\xe9".encode("latin-1")
+
+
+@pytest.fixture(autouse=True)
+def profile_token(monkeypatch):
+    monkeypatch.setattr(ProfilingConfig, "PROFILE_TOKEN", "secret")
+    monkeypatch.setattr(ProfilingConfig, "PROFILE_SAMPLE_RATE", 0.0)
+
+
+def test_tokens_are_compared():
+    assert is_authorized("secret")
+    assert not is_authorized("wrong")
+    assert not is_authorized(None)
+    assert not is_authorized("\xe9")
+
+
+def test_non_ascii_profile_header_is_not_authorized():
+    client = TestClient(app)
+
+    response = client.get(
+        "/admin/deadlines",
+        headers={"X-Admin-Token": "secret", "X-Profile": NON_ASCII_TOKEN}
+    )
+
+    assert response.status_code == 200
+
+
+def test_non_ascii_admin_token_is_rejected():
+    client = TestClient(app)
+
+    response = client.get("/admin/deadlines", headers={"X-Admin-Token": NON_ASCII_TOKEN})
+
+    assert response.status_code == 403
+
+
+def test_only_authorized_requests_are_profiled():
+    client = TestClient(app)
+    SLOW_REQUESTS.clear()
+
+    client.get("/admin/deadlines", headers={"X-Admin-Token": "secret"})
+    client.get("/admin/deadlines", headers={"X-Admin-Token": "secret", "X-Profile": "secret"})
+
+    profiles = SLOW_REQUESTS.profiles()
+    assert len(profiles) == 1
+    assert profiles[0].path == "/admin/deadlines"
+    assert profiles[0].status_code == 200
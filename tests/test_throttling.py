@@ -0,0 +1,245 @@
+"""
+Simulation tests of the client-side adaptive throttling
+"""
+
+import random
+import asyncio
+
+import pytest
+from botocore.exceptions import ClientError
+
+from app.db.throttling import (
+    AdaptiveLimiter,
+    AdaptiveThrottler,
+    Priority,
+    ThrottledError,
+    RETRY_POLICY,
+)
+
+
+class SimulatedClock:
+    """
+    A clock that only moves when someone sleeps on it.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, delay):
+        self.now += delay
+
+
+class ThrottlingTable:
+    """
+    A local stand-in for a DynamoDB table: a token bucket that serves `capacity` reads per
+    simulated second, with one second of burst, and throttles the rest.
+    """
+
+    def __init__(self, clock, capacity):
+        self.clock = clock
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = clock()
+        self.served = 0
+        self.throttled = 0
+
+    def get_item(self, **_):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity)
+        self.updated = now
+        if self.tokens < 1:
+            self.throttled += 1
+            raise ClientError(
+                {'Error': {'Code': 'ProvisionedThroughputExceededException', 'Message': 'slow'}},
+                'GetItem'
+            )
+        self.tokens -= 1
+        self.served += 1
+        return {'Item': {}, 'ConsumedCapacity': {'CapacityUnits': 1.0}}
+
+
+def client_error(code, status_code=400):
+    return ClientError(
+        {'Error': {'Code': code, 'Message': code},
+         'ResponseMetadata': {'HTTPStatusCode': status_code}},
+        'GetItem'
+    )
+
+
+def cancelled_transaction(*reasons):
+    return ClientError(
+        {'Error': {'Code': 'TransactionCanceledException', 'Message': 'cancelled'},
+         'CancellationReasons': [{'Code': reason} for reason in reasons],
+         'ResponseMetadata': {'HTTPStatusCode': 400}},
+        'TransactWriteItems'
+    )
+
+
+@pytest.fixture(autouse=True)
+def seed():
+    random.seed(0)
+
+
+def test_send_rate_converges_below_capacity():
+    clock = SimulatedClock()
+    table = ThrottlingTable(clock, capacity=50)
+    throttler = AdaptiveThrottler(clock=clock, sleep=clock.sleep)
+
+    async def run():
+        for _ in range(1000):
+            await throttler.call(table.get_item, 'users', Key={})
+
+    asyncio.run(run())
+
+    assert table.served == 1000
+    assert table.throttled < 0.05 * table.served
+    assert table.served / clock() <= table.capacity
+    assert table.served / clock() >= 0.5 * table.capacity
+    assert throttler.limiter('users').rate < 2 * table.capacity
+
+
+def test_rate_decreases_multiplicatively_and_increases_additively():
+    limiter = AdaptiveLimiter(rate=100, clock=SimulatedClock())
+
+    limiter.on_throttle()
+    assert limiter.rate == 50
+    assert limiter.throttles == 1
+
+    limiter.on_success(consumed=5)
+    assert limiter.rate == pytest.approx(50 + 5 / 50)
+    assert limiter.consumed == 5
+
+
+def test_batch_calls_leave_the_interactive_reserve():
+    limiter = AdaptiveLimiter(rate=10, clock=SimulatedClock())
+
+    batch = 0
+    while limiter.wait_time(call_priority=Priority.BATCH) == 0:
+        batch += 1
+    interactive = 0
+    while limiter.wait_time(call_priority=Priority.INTERACTIVE) == 0:
+        interactive += 1
+
+    assert batch == 5
+    assert interactive == 5
+
+
+def test_limiters_are_kept_per_table_and_index():
+    throttler = AdaptiveThrottler(clock=SimulatedClock())
+
+    assert throttler.limiter('users') is throttler.limiter('users')
+    assert throttler.limiter('users') is not throttler.limiter('users', 'email-index')
+
+
+def test_throttled_call_gives_up_after_its_retries():
+    clock = SimulatedClock()
+    throttler = AdaptiveThrottler(clock=clock, sleep=clock.sleep)
+    attempts = []
+
+    def always_throttled(**_):
+        attempts.append(clock())
+        raise client_error('ProvisionedThroughputExceededException')
+
+    with pytest.raises(ThrottledError):
+        asyncio.run(throttler.call(always_throttled, 'users', call_priority=Priority.INTERACTIVE))
+
+    assert len(attempts) == RETRY_POLICY[Priority.INTERACTIVE]["max_retries"] + 1
+    assert throttler.limiter('users').rate < 100
+
+
+def test_transient_errors_are_retried_without_slowing_down():
+    clock = SimulatedClock()
+    throttler = AdaptiveThrottler(clock=clock, sleep=clock.sleep)
+    errors = [client_error('InternalServerError', 500)]
+
+    def flaky(**_):
+        if errors:
+            raise errors.pop()
+        return {}
+
+    assert asyncio.run(throttler.call(flaky, 'users')) == {}
+    assert throttler.limiter('users').throttles == 0
+
+
+def test_other_errors_are_not_retried():
+    throttler = AdaptiveThrottler(clock=SimulatedClock())
+    attempts = []
+
+    def invalid(**_):
+        attempts.append(1)
+        raise client_error('ValidationException')
+
+    with pytest.raises(ClientError):
+        asyncio.run(throttler.call(invalid, 'users'))
+
+    assert len(attempts) == 1
+
+
+def test_transaction_conflicts_are_retried():
+    clock = SimulatedClock()
+    throttler = AdaptiveThrottler(clock=clock, sleep=clock.sleep)
+    errors = [cancelled_transaction('None', 'TransactionConflict')] * 2
+
+    def conflicting(**_):
+        if errors:
+            raise errors.pop()
+        return {}
+
+    assert asyncio.run(throttler.call(conflicting, 'items')) == {}
+    assert clock() > 0
+    assert throttler.limiter('items').throttles == 0
+
+
+def test_failed_transaction_conditions_are_not_retried():
+    throttler = AdaptiveThrottler(clock=SimulatedClock())
+    attempts = []
+
+    def conditional(**_):
+        attempts.append(1)
+        raise cancelled_transaction('ConditionalCheckFailed', 'TransactionConflict')
+
+    with pytest.raises(ClientError):
+        asyncio.run(throttler.call(conditional, 'items'))
+
+    assert len(attempts) == 1
+
+
+def test_unprocessed_batch_requests_are_sent_again():
+    clock = SimulatedClock()
+    throttler = AdaptiveThrottler(clock=clock, sleep=clock.sleep)
+    requests = []
+
+    def batch_write(RequestItems, **_):
+        requests.append(RequestItems)
+        if len(requests) == 1:
+            return {'UnprocessedItems': {'items': RequestItems['items'][1:]}}
+        return {'UnprocessedItems': {}}
+
+    responses = asyncio.run(throttler.call_batch(
+        batch_write, 'items', {'items': ['a', 'b', 'c']}, 'UnprocessedItems'
+    ))
+
+    assert len(responses) == 2
+    assert requests == [{'items': ['a', 'b', 'c']}, {'items': ['b', 'c']}]
+    assert throttler.limiter('items').throttles == 1
+
+
+def test_unprocessed_batch_requests_give_up_after_their_retries():
+    clock = SimulatedClock()
+    throttler = AdaptiveThrottler(clock=clock, sleep=clock.sleep)
+    attempts = []
+
+    def never_processed(RequestItems, **_):
+        attempts.append(1)
+        return {'UnprocessedKeys': RequestItems}
+
+    with pytest.raises(ThrottledError):
+        asyncio.run(throttler.call_batch(
+            never_processed, 'items', {'items': {'Keys': [{}]}}, 'UnprocessedKeys',
+            call_priority=Priority.BATCH
+        ))
+
+    assert len(attempts) == RETRY_POLICY[Priority.BATCH]["max_retries"] + 1